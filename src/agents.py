@@ -1,7 +1,7 @@
 from crewai import Agent
 from langchain_openai import ChatOpenAI
 from knowledge_base_tools import knowledge_base_search_tool, source_formatter_tool
-from analysis_tools import python_code_executor_tool
+from analysis_tools import python_code_executor_tool, table_catalog_tool, table_query_tool
 from google_tools import (
     gmail_search_tool, gmail_summarize_tool, gmail_filter_tool, gmail_folders_tool,
     gmail_attachment_tool, gmail_forward_attachment_tool, gmail_action_tool,
@@ -76,21 +76,23 @@ def get_text_analyst_agent():
                             - Look for process steps, policy rules, and system configurations
                             - Present findings clearly with proper source attribution
                             
+                            For totals, filters or other numbers from spreadsheets, query the tables with the Table Query Tool instead of counting rows in the context.
+
                             You are thorough but accurate, ensuring no relevant information is missed while maintaining strict source-based accuracy.""",
-                tools=[source_formatter_tool], llm=llm, verbose=True)
+                tools=[source_formatter_tool, table_catalog_tool, table_query_tool], llm=llm, verbose=True)
 
 def get_data_analyst_agent():
     return Agent(role='Data Analyst',
                 goal="Analyze the user's request and provided text to identify data and specifications for a chart.",
-                backstory="You are an expert at understanding data requirements from natural language.",
-                llm=llm, verbose=True)
+                backstory="You are an expert at understanding data requirements from natural language. When the data lives in knowledge base spreadsheets, you pull exact figures with the Table Query Tool.",
+                tools=[table_catalog_tool, table_query_tool], llm=llm, verbose=True)
 
 def get_data_preparation_agent():
     return  Agent(role='Data Preparation Specialist',
                 goal="Take raw text and the analyst's plan, then extract and format it into a perfect CSV string.",
                 backstory="""You Organize your data into the right format for creating charts.
                 "You are a meticulous data cleaner who helps organize data properly for visualization.""",
-                llm=llm, verbose=True)
+                tools=[table_query_tool], llm=llm, verbose=True)
 
 def get_code_generation_agent():
     return Agent(role='Plotly Code Generator with Comparative Analysis - Syntax Perfect',
@@ -3,6 +3,8 @@ import plotly.express as px
 from crewai.tools import tool
 import io
 import re
+import config
+from table_store import get_table_catalog, run_table_query
 
 
 @tool("Python Code Executor Tool")
@@ -25,4 +27,35 @@ def python_code_executor_tool(code: str) -> str:
         exec(code, execution_globals)
         return "Chart generated successfully and saved to chart.html."
     except Exception as e:
-        return f"Error executing code: {e}"
\ No newline at end of file
+        return f"Error executing code: {e}"
+
+@tool("Table Catalog Tool")
+def table_catalog_tool() -> str:
+    """
+    Lists the spreadsheet tables (from CSV/Excel files in the knowledge base) that can be
+    queried with the Table Query Tool, with their source file, row count and column names.
+    """
+    catalog = get_table_catalog()
+    if not catalog:
+        return "No queryable tables are available in the Knowledge Base."
+    return "\n".join(f"- {name} (from {table['source']}, {table['rows']} rows): {', '.join(table['columns'])}"
+                     for name, table in catalog.items())
+
+
+@tool("Table Query Tool")
+def table_query_tool(sql: str) -> str:
+    """
+    Runs a read-only DuckDB SQL query (SELECT/WITH) over the knowledge base spreadsheet tables
+    and returns the result as CSV. Use it for totals, filters, group-bys and any numbers needed
+    for charts instead of reading individual rows. Quote column names with spaces, e.g.
+    SELECT "Region", SUM("Net Sales") FROM q3_sales GROUP BY 1. Use the Table Catalog Tool
+    to find table and column names.
+    """
+    try:
+        df = run_table_query(sql, max_rows=config.TABLE_QUERY_MAX_ROWS + 1)
+    except Exception as e:
+        return f"Error running table query: {e}"
+    truncated = len(df) > config.TABLE_QUERY_MAX_ROWS
+    result = df.head(config.TABLE_QUERY_MAX_ROWS).to_csv(index=False)
+    return result + (f"\n(Showing the first {config.TABLE_QUERY_MAX_ROWS} rows; aggregate or add a LIMIT to see less.)"
+                     if truncated else "")
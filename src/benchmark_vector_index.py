@@ -0,0 +1,100 @@
+# benchmark_vector_index.py
+"""
+Recall-vs-latency benchmark of the ANN index types against the exact flat index, on the
+vectors of the published knowledge base (or any faiss_index_store folder).
+
+Each index type is built the way the builder builds it (vector_index.build_ann_index) and then
+swept over nprobe (IVF) or efSearch (HNSW). For every setting it reports recall@k against the
+flat index's results, single-query latency (p50/p95) and index size. Use it to pick
+VECTOR_INDEX_TYPE, IVF_NPROBE and HNSW_EF_SEARCH in config.py.
+
+Usage:
+    python benchmark_vector_index.py                         # sampled stored vectors as queries
+    python benchmark_vector_index.py --queries queries.txt   # one real query per line (embedded via the API)
+    python benchmark_vector_index.py --types hnsw ivf_pq --k 25 --num-queries 500
+"""
+import os
+import time
+import argparse
+import numpy as np
+import config
+from kb_store import get_current_generation
+from vector_index import INDEX_TYPES, build_ann_index, apply_search_params, describe_index
+
+NPROBE_SWEEP = (1, 4, 8, 16, 32, 64, 128)
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256)
+
+def load_flat_index(index_dir: str | None):
+    import faiss
+    if index_dir is None:
+        current = get_current_generation()
+        if current is None:
+            raise SystemExit("No knowledge base is published; build one first or pass --index.")
+        index_dir = current[1]["index"]
+    return faiss.read_index(os.path.join(index_dir, "index.faiss"))
+
+def load_queries(flat_index, queries_file: str | None, num_queries: int) -> np.ndarray:
+    if queries_file:
+        from embedding_cache import create_openai_embeddings
+        with open(queries_file, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()][:num_queries]
+        return np.asarray(create_openai_embeddings().embed_documents(texts), dtype=np.float32)
+    ids = np.random.default_rng(1).choice(flat_index.ntotal, min(num_queries, flat_index.ntotal), replace=False)
+    return np.vstack([flat_index.reconstruct(int(i)) for i in ids]).astype(np.float32)
+
+def measure(index, queries: np.ndarray, k: int, truth: np.ndarray | None = None) -> dict:
+    """Searches one query at a time (as the retrieval engine does) and returns latency and recall@k."""
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        _, positions = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(positions[0])
+    results = np.vstack(results)
+    recall = 1.0
+    if truth is not None:
+        recall = float(np.mean([len(set(found[found >= 0]) & set(expected[expected >= 0])) / max(1, np.sum(expected >= 0))
+                                for found, expected in zip(results, truth)]))
+    return {"recall": recall, "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)), "results": results}
+
+def print_row(name: str, setting: str, stats: dict, size: str = ""):
+    print(f"{name:<10} {setting:<14} {stats['recall']:>9.3f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f}  {size}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recall vs latency of ANN vector indexes against the flat index.")
+    parser.add_argument("--index", default=None, help="faiss_index_store folder (default: published generation)")
+    parser.add_argument("--types", nargs="+", default=[t for t in INDEX_TYPES if t != "flat"], choices=INDEX_TYPES[1:])
+    parser.add_argument("--queries", default=None, help="Text file with one query per line")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=config.HYBRID_TOP_K)
+    parser.add_argument("--threads", type=int, default=1, help="FAISS threads (1 matches per-request search)")
+    args = parser.parse_args()
+
+    import faiss
+    faiss.omp_set_num_threads(args.threads)
+    flat_index = load_flat_index(args.index)
+    queries = load_queries(flat_index, args.queries, args.num_queries)
+    print(f"{flat_index.ntotal} vectors of dimension {flat_index.d}, {len(queries)} queries, recall@{args.k}\n")
+    print(f"{'index':<10} {'setting':<14} {'recall':>9} {'p50 ms':>9} {'p95 ms':>9}  size")
+
+    baseline = measure(flat_index, queries, args.k)
+    truth = baseline["results"]
+    print_row("flat", "exact", baseline, describe_index(flat_index))
+
+    # Benchmark every type regardless of corpus size.
+    config.VECTOR_INDEX_MIN_VECTORS = 0
+    for index_type in args.types:
+        started = time.perf_counter()
+        index = build_ann_index(flat_index, index_type)
+        size = f"{describe_index(index)}, built in {time.perf_counter() - started:.1f}s"
+        if index_type == "hnsw":
+            settings = [("efSearch", value, {"ef_search": value}) for value in EF_SEARCH_SWEEP]
+        else:
+            settings = [("nprobe", value, {"nprobe": value}) for value in NPROBE_SWEEP
+                        if value <= faiss.downcast_index(index).nlist]
+        for label, value, params in settings:
+            apply_search_params(index, **params)
+            print_row(index_type, f"{label}={value}", measure(index, queries, args.k, truth), size)
+            size = ""
+        del index
@@ -0,0 +1,175 @@
+# bm25_index.py
+import os
+import json
+import math
+from collections import Counter
+import numpy as np
+
+# Files making up an on-disk BM25 index; every array is a plain .npy so it can be memory-mapped.
+_ARRAY_FILES = ["indptr", "doc_ids", "term_freqs", "doc_len", "chunk_ids", "idf", "norm"]
+
+# --- Sparse BM25 Index ---
+class SparseBM25Index:
+    """
+    Okapi BM25 over a term-major CSR matrix of term frequencies.
+    Uses the same parameters and IDF floor as rank_bm25.BM25Okapi, so scores and
+    rankings match it, but scoring only touches the postings of the query terms.
+    """
+
+    def __init__(self, vocab: dict, indptr: np.ndarray, doc_ids: np.ndarray, term_freqs: np.ndarray,
+                 doc_len: np.ndarray, chunk_ids: np.ndarray | None = None, k1: float = 1.5, b: float = 0.75,
+                 epsilon: float = 0.25, idf: np.ndarray | None = None, norm: np.ndarray | None = None):
+        self.vocab = vocab                # term -> row in the CSR matrix
+        self.indptr = indptr              # row t spans postings[indptr[t]:indptr[t + 1]]
+        self.doc_ids = doc_ids            # column (document) of each posting
+        self.term_freqs = term_freqs      # term frequency of each posting
+        self.doc_len = doc_len
+        # Documents are referenced by chunk id (the chunk store key) rather than storing their text.
+        self.chunk_ids = chunk_ids if chunk_ids is not None else np.arange(len(doc_len), dtype=np.int64)
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.corpus_size = len(doc_len)
+        self.avgdl = float(doc_len.sum()) / self.corpus_size if self.corpus_size else 0.0
+        self.idf = idf if idf is not None else self._compute_idf()
+        # Per-document length normalisation, precomputed once instead of per query term.
+        if norm is None:
+            norm = self.k1 * (1 - self.b + self.b * doc_len / self.avgdl) if self.avgdl else np.zeros(self.corpus_size)
+        self._norm = norm
+
+    @classmethod
+    def from_tokenized(cls, tokenized_corpus: list[list[str]], chunk_ids: list[int] | None = None,
+                       **params) -> "SparseBM25Index":
+        vocab = {}
+        term_ids, doc_ids, term_freqs, doc_len = _tokenized_to_triples(tokenized_corpus, vocab)
+        if chunk_ids is not None:
+            params["chunk_ids"] = np.asarray(chunk_ids, dtype=np.int64)
+        return cls._from_triples(vocab, term_ids, doc_ids, term_freqs, doc_len, **params)
+
+    @classmethod
+    def _from_triples(cls, vocab: dict, term_ids: np.ndarray, doc_ids: np.ndarray, term_freqs: np.ndarray,
+                      doc_len: np.ndarray, **params) -> "SparseBM25Index":
+        """Packs (term, doc, tf) triples into term-major CSR arrays."""
+        order = np.lexsort((doc_ids, term_ids))
+        row_counts = np.bincount(term_ids, minlength=len(vocab))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(row_counts, out=indptr[1:])
+        return cls(vocab, indptr, doc_ids[order].astype(np.int32), term_freqs[order].astype(np.int32),
+                   doc_len.astype(np.int32), **params)
+
+    def _triples(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Expands the CSR postings back into (term, doc, tf) triples."""
+        term_ids = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int64), np.diff(self.indptr))
+        return term_ids, np.asarray(self.doc_ids, dtype=np.int64), np.asarray(self.term_freqs, dtype=np.int64)
+
+    @classmethod
+    def merged(cls, indexes: list["SparseBM25Index"], remove_chunk_ids=()) -> "SparseBM25Index":
+        """
+        Concatenates indexes (e.g. the previous generation and the segments of a streaming build)
+        into one, dropping the documents of remove_chunk_ids. Only postings are combined, never
+        document text, and the scores match a fresh build over the remaining documents.
+        """
+        remove = np.fromiter(remove_chunk_ids, dtype=np.int64)
+        vocab, parts, doc_offset = {}, [], 0
+        for index in indexes:
+            keep_docs = ~np.isin(np.asarray(index.chunk_ids), remove)
+            new_row = doc_offset + np.cumsum(keep_docs) - 1
+            term_ids, doc_ids, term_freqs = index._triples()
+            keep = keep_docs[doc_ids]
+            # Map this index's term rows onto the shared vocabulary.
+            row_map = np.empty(len(index.vocab), dtype=np.int64)
+            for term, row in index.vocab.items():
+                row_map[row] = vocab.setdefault(term, len(vocab))
+            parts.append((row_map[term_ids[keep]], new_row[doc_ids[keep]], term_freqs[keep],
+                          np.asarray(index.doc_len, dtype=np.int64)[keep_docs], np.asarray(index.chunk_ids)[keep_docs]))
+            doc_offset += int(keep_docs.sum())
+        term_ids, doc_ids, term_freqs, doc_len, chunk_ids = (
+            np.concatenate([part[i] for part in parts]) if parts else np.zeros(0, dtype=np.int64) for i in range(5))
+
+        # Drop terms that no longer occur anywhere, renumbering the remaining rows.
+        used = np.bincount(term_ids, minlength=len(vocab)) > 0
+        remap = np.cumsum(used) - 1
+        vocab = {term: int(remap[row]) for term, row in vocab.items() if used[row]}
+        first = indexes[0]
+        return cls._from_triples(vocab, remap[term_ids], doc_ids, term_freqs, doc_len,
+                                 chunk_ids=chunk_ids.astype(np.int64), k1=first.k1, b=first.b, epsilon=first.epsilon)
+
+    def _compute_idf(self) -> np.ndarray:
+        doc_freqs = np.diff(self.indptr)
+        idf = np.log(self.corpus_size - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        # Same floor as BM25Okapi: terms in more than half the corpus get epsilon * average idf.
+        if len(idf):
+            average_idf = math.fsum(idf) / len(idf)
+            idf[idf < 0] = self.epsilon * average_idf
+        return idf
+
+    # --- Persistence ---
+    def save(self, path: str):
+        """Writes the index as a folder of .npy arrays plus a small JSON header with the vocabulary."""
+        os.makedirs(path, exist_ok=True)
+        arrays = {"indptr": self.indptr, "doc_ids": self.doc_ids, "term_freqs": self.term_freqs,
+                  "doc_len": self.doc_len, "chunk_ids": self.chunk_ids, "idf": self.idf, "norm": self._norm}
+        for name in _ARRAY_FILES:
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(arrays[name]))
+        # Vocabulary is stored in row order, so row ids never need to be written out.
+        terms = [None] * len(self.vocab)
+        for term, row in self.vocab.items():
+            terms[row] = term
+        with open(os.path.join(path, "header.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "epsilon": self.epsilon, "terms": terms}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "SparseBM25Index":
+        """
+        Opens an index written by save(). With mmap=True the postings are mapped rather than
+        read, so cold start is near-instant and every process shares the same OS page cache.
+        """
+        with open(os.path.join(path, "header.json"), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in _ARRAY_FILES}
+        vocab = {term: row for row, term in enumerate(header["terms"])}
+        return cls(vocab, arrays["indptr"], arrays["doc_ids"], arrays["term_freqs"], arrays["doc_len"],
+                   chunk_ids=arrays["chunk_ids"], k1=header["k1"], b=header["b"], epsilon=header["epsilon"],
+                   idf=arrays["idf"], norm=arrays["norm"])
+
+    def get_scores(self, tokenized_query: list[str]) -> np.ndarray:
+        """Sparse mat-vec of the query against the CSR matrix; returns one score per document."""
+        scores = np.zeros(self.corpus_size)
+        for term in tokenized_query:
+            row = self.vocab.get(term)
+            if row is None:
+                continue
+            start, end = self.indptr[row], self.indptr[row + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end].astype(np.float64)
+            scores[docs] += self.idf[row] * (tf * (self.k1 + 1) / (tf + self._norm[docs]))
+        return scores
+
+    def top_k(self, tokenized_query: list[str], k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns (chunk ids, scores) of the k best positive-scoring documents, best first."""
+        scores = self.get_scores(tokenized_query)
+        top_rows = top_k_indices(scores, k, min_score=0.0)
+        return np.asarray(self.chunk_ids[top_rows]), scores[top_rows]
+
+def _tokenized_to_triples(tokenized_corpus: list[list[str]], vocab: dict) -> tuple:
+    """Counts terms per document, extending vocab in place; returns (term_ids, doc_ids, tfs, doc_len)."""
+    term_ids, doc_ids, term_freqs = [], [], []
+    doc_len = np.zeros(len(tokenized_corpus), dtype=np.int64)
+    for i, tokens in enumerate(tokenized_corpus):
+        doc_len[i] = len(tokens)
+        for term, freq in Counter(tokens).items():
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            doc_ids.append(i)
+            term_freqs.append(freq)
+    return (np.array(term_ids, dtype=np.int64), np.array(doc_ids, dtype=np.int64),
+            np.array(term_freqs, dtype=np.int64), doc_len)
+
+def top_k_indices(scores: np.ndarray, k: int, min_score: float | None = None) -> np.ndarray:
+    """argpartition-based top-k; ties are broken by the lower index so results are deterministic."""
+    candidates = np.flatnonzero(scores > min_score) if min_score is not None else np.arange(len(scores))
+    if len(candidates) > k:
+        kth = np.argpartition(-scores[candidates], k - 1)[:k]
+        # Keep every candidate tied with the k-th score so the tie-break below is stable.
+        threshold = scores[candidates[kth]].min()
+        candidates = candidates[scores[candidates] >= threshold]
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
@@ -0,0 +1,74 @@
+# caches.py
+import time
+import threading
+from collections import OrderedDict
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as a cache key."""
+    return " ".join(query.lower().split())
+
+# --- Bounded LRU Cache with TTL ---
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live and hit/miss counters."""
+
+    def __init__(self, maxsize: int, ttl_seconds: float | None = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data),
+                    "hit_rate": self.hits / total if total else 0.0}
+
+class HitCounter:
+    """Thread-safe hit/miss counters, reported like LRUCache.stats() for tiers that are not an LRUCache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+def format_cache_stats(stats: dict) -> str:
+    text = f"{stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)"
+    return text + (f", {stats['size']} entries" if "size" in stats else "")
@@ -0,0 +1,152 @@
+# chunk_sizing.py
+import re
+import math
+from langchain_community.docstore.document import Document
+import config
+from embedding_pipeline import get_token_counter
+
+# Sentence ends (including CJK full-width marks, which are not followed by a space) and line
+# breaks; the separators are kept so split chunks read like the original text.
+_SENTENCE_BREAK = re.compile(r"((?<=[.!?])\s+|(?<=[。！？])|\n+)")
+
+# --- Token-Bounded Chunk Sizing ---
+class ChunkSizer:
+    """
+    Keeps structural chunks between min_tokens and max_tokens. Oversized chunks are split at
+    sentence (or line) boundaries, carrying up to overlap_tokens of trailing sentences into the
+    next piece; small neighbouring text chunks are merged while they fit. Tables are split but
+    never merged, image chunks are left alone. Every chunk gets its size in metadata["tokens"].
+    """
+
+    def __init__(self, min_tokens: int | None = None, max_tokens: int | None = None,
+                 overlap_tokens: int | None = None, count_tokens=None):
+        self.min_tokens = config.CHUNK_MIN_TOKENS if min_tokens is None else min_tokens
+        self.max_tokens = max_tokens or config.CHUNK_MAX_TOKENS
+        self.overlap_tokens = config.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        self.count_tokens = count_tokens or get_token_counter(config.OPENAI_EMBEDDING_MODEL)
+
+    def apply(self, chunks: list[Document]) -> list[Document]:
+        sized = []
+        for chunk in chunks:
+            # Chunks of one section may share a metadata dict; give each its own before annotating it.
+            chunk.metadata = dict(chunk.metadata)
+            if chunk.metadata.get("content_type") == "image":
+                chunk.metadata["tokens"] = self.count_tokens(chunk.page_content)
+                sized.append(chunk)
+            else:
+                sized.extend(self.split(chunk))
+        return self.merge(sized)
+
+    def split(self, chunk: Document) -> list[Document]:
+        units = self._units(chunk.page_content)
+        total = sum(tokens for _, tokens in units)
+        if total <= self.max_tokens:
+            chunk.metadata["tokens"] = total
+            return [chunk]
+        pieces, current, current_tokens = [], [], 0
+        for unit in units:
+            if current and current_tokens + unit[1] > self.max_tokens:
+                pieces.append(current)
+                # Start the next piece with the previous one's trailing sentences, up to the overlap budget.
+                carry, carry_tokens = [], 0
+                for previous in reversed(current):
+                    if carry_tokens + previous[1] > self.overlap_tokens:
+                        break
+                    carry.insert(0, previous)
+                    carry_tokens += previous[1]
+                if carry_tokens + unit[1] > self.max_tokens:
+                    carry, carry_tokens = [], 0
+                current, current_tokens = carry, carry_tokens
+            current.append(unit)
+            current_tokens += unit[1]
+        pieces.append(current)
+        return [Document(page_content="".join(text for text, _ in piece).strip(),
+                         metadata={**chunk.metadata, "tokens": sum(tokens for _, tokens in piece),
+                                   "chunk_part": part, "chunk_parts": len(pieces)})
+                for part, piece in enumerate(pieces)]
+
+    def merge(self, chunks: list[Document]) -> list[Document]:
+        merged = []
+        for chunk in chunks:
+            previous = merged[-1] if merged else None
+            if (previous is not None and _mergeable(previous) and _mergeable(chunk, follows=True)
+                    and min(previous.metadata["tokens"], chunk.metadata["tokens"]) < self.min_tokens
+                    and previous.metadata["tokens"] + chunk.metadata["tokens"] <= self.max_tokens):
+                titles = previous.metadata.get("section_titles") or [previous.metadata.get("section_title")]
+                title = chunk.metadata.get("section_title")
+                if title and title not in titles:
+                    # Merged across a section boundary: keep every section the chunk now covers.
+                    previous.metadata["section_titles"] = [t for t in titles if t] + [title]
+                previous.page_content += "\n" + chunk.page_content
+                previous.metadata["tokens"] += chunk.metadata["tokens"]
+                continue
+            merged.append(chunk)
+        return merged
+
+    def _units(self, text: str) -> list[tuple[str, int]]:
+        """Splits text into sentences (each with its trailing separator) and their token counts."""
+        parts = _SENTENCE_BREAK.split(text)
+        units = []
+        for i in range(0, len(parts), 2):
+            unit = parts[i] + (parts[i + 1] if i + 1 < len(parts) else "")
+            if not unit.strip():
+                continue
+            units.extend(self._cut(unit, self.count_tokens(unit)))
+        return units
+
+    def _cut(self, text: str, tokens: int) -> list[tuple[str, int]]:
+        """
+        Cuts a single sentence over the limit (e.g. a table row dump) into equal word runs, or
+        into equal character runs when it has no spaces to cut at (CJK prose, base64, long URLs).
+        """
+        if tokens <= self.max_tokens or len(text) <= 1:
+            return [(text, tokens)]
+        pieces = max(2, math.ceil(tokens / self.max_tokens))
+        words = text.split(" ")
+        if len(words) >= pieces:
+            step = math.ceil(len(words) / pieces)
+            parts = [" ".join(words[start:start + step]) + " " for start in range(0, len(words), step)]
+        else:
+            step = math.ceil(len(text) / pieces)
+            parts = [text[start:start + step] for start in range(0, len(text), step)]
+        # Token density varies along the text, so re-check every part and cut again where needed.
+        return [unit for part in parts for unit in self._cut(part, self.count_tokens(part))]
+
+def _mergeable(chunk: Document, follows: bool = False) -> bool:
+    """Plain text chunks merge; of a split section, only the last piece may take in a small following sibling."""
+    if "content_type" in chunk.metadata:
+        return False
+    if "chunk_part" not in chunk.metadata:
+        return True
+    return not follows and chunk.metadata["chunk_part"] == chunk.metadata["chunk_parts"] - 1
+
+# --- Chunk Length Histogram ---
+class TokenHistogram:
+    """Counts chunk sizes in power-of-two token buckets, for tuning the chunk bounds."""
+
+    EDGES = (32, 64, 128, 256, 512, 1024, 2048)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.EDGES) + 1)
+        self.total = 0
+        self.max = 0
+
+    def add(self, tokens: int):
+        bucket = next((i for i, edge in enumerate(self.EDGES) if tokens < edge), len(self.EDGES))
+        self.counts[bucket] += 1
+        self.total += tokens
+        self.max = max(self.max, tokens)
+
+    def labels(self) -> list[str]:
+        bounds = (0,) + self.EDGES
+        return [f"{low}-{high - 1}" for low, high in zip(bounds, self.EDGES)] + [f"{self.EDGES[-1]}+"]
+
+    def to_dict(self) -> dict:
+        chunks = sum(self.counts)
+        return {"chunks": chunks, "mean": round(self.total / chunks, 1) if chunks else 0, "max": self.max,
+                "buckets": dict(zip(self.labels(), self.counts))}
+
+    def format(self) -> str:
+        summary = self.to_dict()
+        buckets = ", ".join(f"{label}: {count}" for label, count in summary["buckets"].items() if count)
+        return f"{summary['chunks']} chunks, mean {summary['mean']} tokens, max {summary['max']} ({buckets})"
@@ -8,13 +8,108 @@ OPENAI_MODEL_NAME = "gpt-4o"
 # The folder where the FAISS index and metadata will be stored
 INDEX_STORE_PATH = "faiss_index_store" 
 LOCAL_DOCUMENT_PATHS = [r"C:\Users\HP 745 G6\Downloads\Vspark Technologies\fresh_application\knowledge_docs"] # A folder named 'knowledge_docs' in your project root
-BM25_INDEX_PATH = "bm25_index.pkl"
-DOCSTORE_PATH = "parent_docstore.pkl"
-IMAGE_STORE_PATH = "./image_store"
+BM25_INDEX_PATH = "bm25_index.pkl"  # Legacy pickled index written by older builds
+BM25_INDEX_DIR = "bm25_index"  # Memory-mapped postings folder inside each KB generation
+DOCSTORE_PATH = "parent_docstore.pkl"  # Legacy pickled InMemoryStore written by older builds
+PARENT_STORE_FILE = "parent_store.sqlite"  # SQLite parent store inside each KB generation
+CHUNK_STORE_FILE = "chunk_store.sqlite"  # SQLite child chunk text inside each KB generation (FAISS keeps only vectors)
+IMAGE_STORE_PATH = "./image_store"  # Images stored under their content hash, shared across documents and builds
+IMAGE_THUMBNAIL_SIZE = 512  # Longest edge in pixels of the cached thumbnails returned at retrieval time
+TABLE_STORE_PATH = "./table_store"  # Spreadsheets as Parquet, queried by the table query tool
+# Each build is written to its own generation folder under KB_STORE_PATH and only
+# becomes visible to readers once the manifest is atomically switched to it.
+KB_STORE_PATH = "kb_store"
+KB_MANIFEST_FILE = "CURRENT.json"
+KB_GENERATIONS_TO_KEEP = 2
+
+# --- Retrieval Configuration ---
+HYBRID_TOP_K = 25  # Candidates taken from each of the vector and BM25 retrievers
+FUSED_CANDIDATES = 50  # Candidates kept after fusion and passed to the reranker
+RRF_K = 60  # Reciprocal-rank-fusion damping constant
+FUSION_WEIGHTS = {"vector": 1.0, "keyword": 1.0}
+
+# --- Reranker Configuration ---
+RERANKER_BACKEND = "cohere"  # "cohere" (hosted API) or "cross-encoder" (local CPU, works offline)
+COHERE_RERANK_MODEL = "rerank-english-v3.0"
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_TOP_N = 5
+RERANK_MAX_CANDIDATES = 50  # Upper bound on passages scored per query
+RERANK_BATCH_SIZE = 16
+RERANK_WORKERS = 2
+RERANK_CACHE_SIZE = 1024  # Cached (query, candidate set) rerank results per process
+RERANK_CACHE_TTL_SECONDS = 3600
+
+# --- Vector Index Configuration ---
+# "flat" (exact), "ivf_flat", "hnsw" or "ivf_pq" (compressed); see vector_index.py. Updates reuse the previous
+# generation's index: appends only add the new vectors, and IVF types keep their training when chunks are removed.
+# HNSW cannot remove vectors, so any update that removes chunks rebuilds the whole graph, which at millions of
+# chunks dominates update time; prefer an IVF type for frequently edited corpora.
+VECTOR_INDEX_TYPE = "flat"
+VECTOR_INDEX_RETRAIN_FACTOR = 2.0  # IVF indexes are retrained once the corpus grows or shrinks by this factor
+VECTOR_INDEX_MIN_VECTORS = 50000  # Smaller knowledge bases always use the exact flat index
+VECTOR_INDEX_TRAIN_SAMPLE = 100000  # Vectors sampled to train IVF centroids and PQ codebooks
+IVF_NLIST = 0  # Inverted lists; 0 = 4 * sqrt(number of vectors)
+IVF_NPROBE = 16  # Lists scanned per query: higher is more accurate and slower
+HNSW_M = 32  # Graph neighbours per node
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64  # Candidate list size per query: higher is more accurate and slower
+PQ_M = 0  # PQ sub-quantizers (must divide the embedding size); 0 = about dim / 16
+PQ_NBITS = 8
+
+# --- Context Assembly Configuration ---
+CONTEXT_TOKEN_BUDGET = 6000  # Total tokens of retrieved passages handed to the agents
+CONTEXT_WINDOW_TOKENS = 1200  # Window of neighbouring chunks around each hit
+CONTEXT_WHOLE_PARENT_TOKENS = 1500  # Parents up to this size are returned whole instead of windowed
+
+# --- Embedding Cache Configuration ---
+EMBEDDING_CACHE_PATH = "embedding_cache.sqlite"  # Persistent float32 vectors, survives restarts
+QUERY_EMBEDDING_CACHE_SIZE = 4096  # In-process LRU tier for query embeddings
+QUERY_EMBEDDING_STORE_MAX_ROWS = 100_000  # Query embeddings kept on disk; the oldest are pruned when the store opens
+EMBEDDING_API_BASE = None  # e.g. "http://localhost:8765/v1" to use local_embedding_server.py
+EMBEDDING_BATCH_TOKENS = 50000  # Token budget per embedding request
+EMBEDDING_BATCH_MAX_ITEMS = 512  # Texts per embedding request
+EMBEDDING_MAX_IN_FLIGHT = 4  # Embedding requests running concurrently during a build
+EMBEDDING_MAX_RETRIES = 5
+EMBEDDING_MAX_BACKOFF_SECONDS = 30
+
+# --- Build Pipeline Configuration ---
+DRIVE_PAGE_SIZE = 1000  # Files per Drive list request (the API maximum); pages are followed via nextPageToken
+DRIVE_DOWNLOAD_WORKERS = 4  # Concurrent Drive downloads; at most twice this many files are held in memory
+PARTITION_WORKERS = 4  # Worker processes partitioning documents in parallel
+# Fresh interpreters rather than fork(): the builder holds threads (Drive downloads) and open SQLite/FAISS
+# handles that a forked child would inherit in an undefined state. "forkserver" also works on POSIX.
+PARTITION_START_METHOD = "spawn"
+PARTITION_STRATEGY = "auto"  # "auto" plans fast/ocr_only/hi_res per document and page run; or force one strategy
+PARTITION_SCANNED_STRATEGY = "ocr_only"  # Used for images and PDF pages without a text layer
+PARTITION_MIN_TEXT_CHARS = 200  # Pages with less extractable text are treated as having no text layer
+PARTITION_HI_RES_IMAGE_COVERAGE = 0.3  # Fraction of a page covered by images that calls for layout detection
+PARTITION_HI_RES_DRAWINGS = 100  # Vector drawing ops (table rules, charts) that call for layout detection
+PARTITION_MIN_RUN_PAGES = 3  # Shorter page runs are folded into a neighbouring heavier strategy
+PARTITION_PAGES_PER_TASK = 25  # Longer PDFs are split into page ranges partitioned on separate workers (0 disables)
+BUILD_SEGMENT_CHUNKS = 5000  # Child chunks buffered before they are flushed to an on-disk index segment
+CHUNK_MIN_TOKENS = 100  # Smaller neighbouring text chunks are merged (up to CHUNK_MAX_TOKENS)
+CHUNK_MAX_TOKENS = 512  # Longer sections are split at sentence boundaries
+CHUNK_OVERLAP_TOKENS = 50  # Trailing sentences repeated at the start of the next split piece (0 disables)
+TABLE_READ_CHUNK_ROWS = 50000  # CSV rows parsed per chunk, so large sheets stream instead of loading at once
+TABLE_ROWS_PER_DOCUMENT = 1  # Consecutive table rows grouped into one child chunk
+TABLE_EMBED_ROWS = False  # Also embed row documents for spreadsheets that are stored as queryable tables
+TABLE_QUERY_MAX_ROWS = 200  # Rows returned to an agent from one table query
+TABLE_OVERVIEW_MAX_TOKENS = 1200  # Budget for a table overview chunk; column summaries past it are omitted
+TABLE_PROFILE_SAMPLE_ROWS = 2000  # Uniform row sample kept for approximate quantiles
+TABLE_PROFILE_TOP_K = 5  # Most frequent values listed per text column
+PARTITION_TIMEOUT_SECONDS = 900  # A file still partitioning after this is skipped and its worker killed
+ENRICHMENT_CACHE_PATH = "enrichment_cache.sqlite"  # Summaries/keywords keyed by content hash
+ENRICHMENT_MAX_CHARS = 4000  # Document prefix sent to the LLM for enrichment
+ENRICHMENT_CONCURRENCY = 8
+ENRICHMENT_REQUESTS_PER_MINUTE = 300
+ENRICHMENT_TOKENS_PER_MINUTE = 200000
+ENRICHMENT_MAX_RETRIES = 5
+ENRICHMENT_MAX_BACKOFF_SECONDS = 30
 # NOTE: Move COHERE_API_KEY to .env file for security
 # COHERE_API_KEY should be in .env file, not here
 # --- Google API Configuration ---
 GDRIVE_FOLDER_ID ="10AQOMvb7ODMdrNoVy2dF2u6gNw8KoS19"
+GDRIVE_SHARED_DRIVE_ID = None  # Set when the folder lives on a shared drive, so its change feed can be followed
 #"root"
 #"1KDRc6FpCdGbzszciV1eohmYwejdbZMn8"
 REDIRECT_URI = "http://localhost:8501"
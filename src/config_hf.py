@@ -67,9 +67,15 @@ def get_index_store_path(session_id: str = "default") -> str:
 def get_bm25_index_path(session_id: str = "default") -> str:
     return str(get_user_session_dir(session_id) / "bm25_index.pkl")
 
+def get_bm25_index_dir(session_id: str = "default") -> str:
+    return str(get_user_session_dir(session_id) / "bm25_index")
+
 def get_docstore_path(session_id: str = "default") -> str:
     return str(get_user_session_dir(session_id) / "parent_docstore.pkl")
 
+def get_kb_store_path(session_id: str = "default") -> str:
+    return str(get_user_session_dir(session_id) / "kb_store")
+
 def get_token_path(session_id: str = "default") -> str:
     return str(get_user_session_dir(session_id) / "token.json")
 
@@ -81,13 +87,105 @@ def get_image_store_path(session_id: str = "default") -> str:
     path.mkdir(exist_ok=True)
     return str(path)
 
+def get_table_store_path(session_id: str = "default") -> str:
+    return str(get_user_session_dir(session_id) / "table_store")
+
 # Default paths (work for both demo and production)
 INDEX_STORE_PATH = get_index_store_path()
 BM25_INDEX_PATH = get_bm25_index_path()
+BM25_INDEX_DIR = get_bm25_index_dir()
 DOCSTORE_PATH = get_docstore_path()
 TOKEN_PATH = get_token_path()
 CREDENTIALS_PATH = get_credentials_path()
 IMAGE_STORE_PATH = get_image_store_path()
+TABLE_STORE_PATH = get_table_store_path()
+KB_STORE_PATH = get_kb_store_path()
+KB_MANIFEST_FILE = "CURRENT.json"
+PARENT_STORE_FILE = "parent_store.sqlite"
+CHUNK_STORE_FILE = "chunk_store.sqlite"
+KB_GENERATIONS_TO_KEEP = int(os.getenv("KB_GENERATIONS_TO_KEEP", "2"))
+
+# --- Retrieval Configuration ---
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", "25"))
+FUSED_CANDIDATES = int(os.getenv("FUSED_CANDIDATES", "50"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+FUSION_WEIGHTS = {
+    "vector": float(os.getenv("FUSION_WEIGHT_VECTOR", "1.0")),
+    "keyword": float(os.getenv("FUSION_WEIGHT_KEYWORD", "1.0"))
+}
+
+# --- Reranker Configuration ---
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "cohere")
+COHERE_RERANK_MODEL = os.getenv("COHERE_RERANK_MODEL", "rerank-english-v3.0")
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "5"))
+RERANK_MAX_CANDIDATES = int(os.getenv("RERANK_MAX_CANDIDATES", "50"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_WORKERS = int(os.getenv("RERANK_WORKERS", "2"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "1024"))
+RERANK_CACHE_TTL_SECONDS = int(os.getenv("RERANK_CACHE_TTL_SECONDS", "3600"))
+
+# --- Vector Index Configuration ---
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+VECTOR_INDEX_RETRAIN_FACTOR = float(os.getenv("VECTOR_INDEX_RETRAIN_FACTOR", "2.0"))
+VECTOR_INDEX_MIN_VECTORS = int(os.getenv("VECTOR_INDEX_MIN_VECTORS", "50000"))
+VECTOR_INDEX_TRAIN_SAMPLE = int(os.getenv("VECTOR_INDEX_TRAIN_SAMPLE", "100000"))
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+PQ_M = int(os.getenv("PQ_M", "0"))
+PQ_NBITS = int(os.getenv("PQ_NBITS", "8"))
+
+# --- Context Assembly Configuration ---
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_WINDOW_TOKENS = int(os.getenv("CONTEXT_WINDOW_TOKENS", "1200"))
+CONTEXT_WHOLE_PARENT_TOKENS = int(os.getenv("CONTEXT_WHOLE_PARENT_TOKENS", "1500"))
+
+# --- Embedding Cache Configuration ---
+EMBEDDING_CACHE_PATH = str(get_user_session_dir() / "embedding_cache.sqlite")
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+QUERY_EMBEDDING_STORE_MAX_ROWS = int(os.getenv("QUERY_EMBEDDING_STORE_MAX_ROWS", "100000"))
+EMBEDDING_API_BASE = os.getenv("EMBEDDING_API_BASE") or None
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "50000"))
+EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "512"))
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+EMBEDDING_MAX_BACKOFF_SECONDS = int(os.getenv("EMBEDDING_MAX_BACKOFF_SECONDS", "30"))
+
+# --- Build Pipeline Configuration ---
+DRIVE_PAGE_SIZE = int(os.getenv("DRIVE_PAGE_SIZE", "1000"))
+DRIVE_DOWNLOAD_WORKERS = int(os.getenv("DRIVE_DOWNLOAD_WORKERS", "4"))
+PARTITION_WORKERS = int(os.getenv("PARTITION_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+PARTITION_START_METHOD = os.getenv("PARTITION_START_METHOD", "spawn")
+PARTITION_TIMEOUT_SECONDS = int(os.getenv("PARTITION_TIMEOUT_SECONDS", "900"))
+PARTITION_STRATEGY = os.getenv("PARTITION_STRATEGY", "auto")
+PARTITION_SCANNED_STRATEGY = os.getenv("PARTITION_SCANNED_STRATEGY", "ocr_only")
+PARTITION_MIN_TEXT_CHARS = int(os.getenv("PARTITION_MIN_TEXT_CHARS", "200"))
+PARTITION_HI_RES_IMAGE_COVERAGE = float(os.getenv("PARTITION_HI_RES_IMAGE_COVERAGE", "0.3"))
+PARTITION_HI_RES_DRAWINGS = int(os.getenv("PARTITION_HI_RES_DRAWINGS", "100"))
+PARTITION_MIN_RUN_PAGES = int(os.getenv("PARTITION_MIN_RUN_PAGES", "3"))
+PARTITION_PAGES_PER_TASK = int(os.getenv("PARTITION_PAGES_PER_TASK", "25"))
+BUILD_SEGMENT_CHUNKS = int(os.getenv("BUILD_SEGMENT_CHUNKS", "5000"))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "100"))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+TABLE_READ_CHUNK_ROWS = int(os.getenv("TABLE_READ_CHUNK_ROWS", "50000"))
+TABLE_ROWS_PER_DOCUMENT = int(os.getenv("TABLE_ROWS_PER_DOCUMENT", "1"))
+TABLE_EMBED_ROWS = os.getenv("TABLE_EMBED_ROWS", "false").lower() == "true"
+TABLE_QUERY_MAX_ROWS = int(os.getenv("TABLE_QUERY_MAX_ROWS", "200"))
+TABLE_OVERVIEW_MAX_TOKENS = int(os.getenv("TABLE_OVERVIEW_MAX_TOKENS", "1200"))
+TABLE_PROFILE_SAMPLE_ROWS = int(os.getenv("TABLE_PROFILE_SAMPLE_ROWS", "2000"))
+TABLE_PROFILE_TOP_K = int(os.getenv("TABLE_PROFILE_TOP_K", "5"))
+IMAGE_THUMBNAIL_SIZE = int(os.getenv("IMAGE_THUMBNAIL_SIZE", "512"))
+ENRICHMENT_CACHE_PATH = str(get_user_session_dir() / "enrichment_cache.sqlite")
+ENRICHMENT_MAX_CHARS = int(os.getenv("ENRICHMENT_MAX_CHARS", "4000"))
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", "8"))
+ENRICHMENT_REQUESTS_PER_MINUTE = int(os.getenv("ENRICHMENT_REQUESTS_PER_MINUTE", "300"))
+ENRICHMENT_TOKENS_PER_MINUTE = int(os.getenv("ENRICHMENT_TOKENS_PER_MINUTE", "200000"))
+ENRICHMENT_MAX_RETRIES = int(os.getenv("ENRICHMENT_MAX_RETRIES", "5"))
+ENRICHMENT_MAX_BACKOFF_SECONDS = int(os.getenv("ENRICHMENT_MAX_BACKOFF_SECONDS", "30"))
 
 # --- Knowledge Base Configuration ---
 # Document paths - configurable via environment
@@ -104,6 +202,7 @@ else:
 
 # --- Google API Configuration ---
 GDRIVE_FOLDER_ID = os.getenv("GDRIVE_FOLDER_ID", "10AQOMvb7ODMdrNoVy2dF2u6gNw8KoS19")
+GDRIVE_SHARED_DRIVE_ID = os.getenv("GDRIVE_SHARED_DRIVE_ID") or None
 
 # Universal redirect URI - platform automatically detected
 def get_redirect_uri():
@@ -183,7 +282,9 @@ class SessionManager:
                 "docstore": get_docstore_path(session_id),
                 "token": get_token_path(session_id),
                 "credentials": get_credentials_path(session_id),
-                "image_store": get_image_store_path(session_id)
+                "image_store": get_image_store_path(session_id),
+                "kb_store": get_kb_store_path(session_id),
+                "table_store": get_table_store_path(session_id)
             }
         else:
             return {
@@ -192,7 +293,9 @@ class SessionManager:
                 "docstore": DOCSTORE_PATH,
                 "token": TOKEN_PATH,
                 "credentials": CREDENTIALS_PATH,
-                "image_store": IMAGE_STORE_PATH
+                "image_store": IMAGE_STORE_PATH,
+                "kb_store": KB_STORE_PATH,
+                "table_store": TABLE_STORE_PATH
             }
     
     @staticmethod
@@ -253,7 +356,7 @@ PLATFORM_INFO = {
 # Export commonly used functions
 __all__ = [
     'INDEX_STORE_PATH', 'BM25_INDEX_PATH', 'DOCSTORE_PATH', 
-    'TOKEN_PATH', 'CREDENTIALS_PATH', 'IMAGE_STORE_PATH',
+    'TOKEN_PATH', 'CREDENTIALS_PATH', 'IMAGE_STORE_PATH', 'KB_STORE_PATH', 'TABLE_STORE_PATH',
     'SessionManager', 'IS_HUGGING_FACE', 'IS_DEMO_MODE',
     'DEMO_CONFIG', 'get_user_session_dir'
 ]
\ No newline at end of file
@@ -0,0 +1,94 @@
+# context_assembler.py
+import config
+from embedding_pipeline import get_token_counter
+
+# --- Parent Passage Windowing ---
+class ContextAssembler:
+    """
+    Builds the retrieved context from the top child chunks without pasting whole parent
+    documents into the prompt. Each hit is widened into a window of its neighbouring chunks
+    (child chunk ids are contiguous within a file) of at most window_tokens; windows in the
+    same parent are merged. Parents no larger than whole_parent_tokens are returned whole.
+    Hits are taken in rank order until token_budget is spent.
+    """
+
+    def __init__(self, engine, token_budget: int | None = None, window_tokens: int | None = None,
+                 whole_parent_tokens: int | None = None, count_tokens=None):
+        self.engine = engine
+        self.token_budget = token_budget or config.CONTEXT_TOKEN_BUDGET
+        self.window_tokens = window_tokens or config.CONTEXT_WINDOW_TOKENS
+        self.whole_parent_tokens = config.CONTEXT_WHOLE_PARENT_TOKENS if whole_parent_tokens is None else whole_parent_tokens
+        self.count_tokens = count_tokens or get_token_counter(config.OPENAI_EMBEDDING_MODEL)
+
+    def assemble(self, hits: list) -> list[dict]:
+        """Returns [{"source", "content", "tokens"}] per parent, in the order their first hit was ranked."""
+        parent_ids = list(dict.fromkeys(hit.metadata.get("parent_doc_id") for hit in hits))
+        parents = dict(zip(parent_ids, self.engine.docstore.mget(parent_ids)))
+        budget = self.token_budget
+        passages = {}
+        for hit in hits:
+            if budget <= 0:
+                break
+            parent_id = hit.metadata.get("parent_doc_id")
+            if parent_id not in passages:
+                parent = parents.get(parent_id)
+                passages[parent_id] = {"source": (parent or hit).metadata.get("source", "N/A"), "whole": None, "chunks": {}}
+                if parent is not None and len(parent.page_content) <= self.whole_parent_tokens * 8:
+                    # Cheap length check first, so large parents are never tokenized.
+                    tokens = self.count_tokens(parent.page_content)
+                    if tokens <= min(self.whole_parent_tokens, budget):
+                        passages[parent_id]["whole"] = (parent.page_content, tokens)
+                        budget -= tokens
+            passage = passages[parent_id]
+            if passage["whole"] is None:
+                budget -= self._add_window(passage["chunks"], hit, parent_id, min(self.window_tokens, budget))
+        return [self._render(passage) for passage in passages.values() if passage["whole"] or passage["chunks"]]
+
+    def _add_window(self, chunks: dict, hit, parent_id, window_budget: int) -> int:
+        """Adds the hit and as many neighbours as fit the window to chunks; returns the tokens added."""
+        hit_id = hit.metadata.get("chunk_id")
+        if hit_id is None:
+            tokens = self._tokens(hit)
+            chunks[("hit", id(hit))] = (hit, tokens)
+            return tokens
+        added = 0
+        if hit_id not in chunks:
+            chunks[hit_id] = (hit, self._tokens(hit))
+            added += chunks[hit_id][1]
+        used = chunks[hit_id][1]
+        # Grow alternately left and right until both sides leave the parent or the window is full.
+        frontier = {-1: hit_id - 1, 1: hit_id + 1}
+        while frontier:
+            for side in list(frontier):
+                chunk_id = frontier[side]
+                if chunk_id in chunks:
+                    used += chunks[chunk_id][1]
+                    frontier[side] += side
+                    continue
+                doc = self.engine.get_chunks([chunk_id])[0] if chunk_id >= 0 else None
+                tokens = self._tokens(doc) if doc is not None else 0
+                if doc is None or doc.metadata.get("parent_doc_id") != parent_id or used + tokens > window_budget:
+                    del frontier[side]
+                    continue
+                chunks[chunk_id] = (doc, tokens)
+                used += tokens
+                added += tokens
+                frontier[side] += side
+        return added
+
+    def _tokens(self, doc) -> int:
+        return doc.metadata.get("tokens") or self.count_tokens(doc.page_content)
+
+    def _render(self, passage: dict) -> dict:
+        if passage["whole"]:
+            content, tokens = passage["whole"]
+            return {"source": passage["source"], "content": content, "tokens": tokens}
+        parts, previous = [], None
+        for key in sorted(passage["chunks"], key=lambda key: key if isinstance(key, int) else float("inf")):
+            doc, _ = passage["chunks"][key]
+            if previous is not None and not (isinstance(key, int) and key == previous + 1):
+                parts.append("[...]")  # Gap between windows
+            parts.append(doc.page_content)
+            previous = key if isinstance(key, int) else None
+        return {"source": passage["source"], "content": "\n".join(parts),
+                "tokens": sum(tokens for _, tokens in passage["chunks"].values())}
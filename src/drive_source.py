@@ -0,0 +1,195 @@
+# drive_source.py
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import config
+
+# Native Google Docs/Sheets/Slides have no binary content to download with get_media.
+GOOGLE_APPS_MIME_PREFIX = "application/vnd.google-apps."
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+FILE_FIELDS = "id, name, mimeType, modifiedTime, parents, trashed"
+
+# --- Google Drive Source ---
+class DriveSource:
+    """
+    Paginated listing, change feeds and thread-safe downloads for one Drive folder tree.
+    googleapiclient service objects are not thread-safe, so each thread builds its own from
+    the credentials. service_factory can be swapped for a local fake of the Drive API.
+    """
+
+    def __init__(self, creds, folder_id: str, service_factory=None, drive_id: str | None = None):
+        self.folder_id = folder_id
+        self.drive_id = drive_id  # Set for shared drives, whose changes are tracked per drive
+        self.service_factory = service_factory or (lambda: _build_service(creds))
+        self._local = threading.local()
+
+    def service(self):
+        if not hasattr(self._local, "service"):
+            self._local.service = self.service_factory()
+        return self._local.service
+
+    def list_folder(self, folder_id: str):
+        """Yields every direct child of a folder, following nextPageToken so large folders are never truncated."""
+        page_token = None
+        while True:
+            response = self.service().files().list(
+                q=f"'{folder_id}' in parents and trashed = false", pageSize=config.DRIVE_PAGE_SIZE,
+                pageToken=page_token, fields=f"nextPageToken, files({FILE_FIELDS})",
+                supportsAllDrives=True, includeItemsFromAllDrives=True).execute()
+            yield from response.get('files', [])
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return
+
+    def crawl(self, root_id: str | None = None) -> tuple[list, set]:
+        """Walks a folder and all of its subfolders; returns (files, ids of every folder in the tree)."""
+        root_id = root_id or self.folder_id
+        files, folders, queue = [], {root_id}, [root_id]
+        while queue:
+            for item in self.list_folder(queue.pop()):
+                if item.get('mimeType') == FOLDER_MIME_TYPE:
+                    if item['id'] not in folders:
+                        folders.add(item['id'])
+                        queue.append(item['id'])
+                else:
+                    files.append(item)
+        return files, folders
+
+    def get_file(self, file_id: str) -> dict:
+        return self.service().files().get(fileId=file_id, fields=FILE_FIELDS, supportsAllDrives=True).execute()
+
+    def get_start_page_token(self) -> str:
+        kwargs = {"driveId": self.drive_id} if self.drive_id else {}
+        return self.service().changes().getStartPageToken(supportsAllDrives=True, **kwargs).execute()['startPageToken']
+
+    def list_changes(self, page_token: str) -> tuple[list, str]:
+        """Returns (every change since page_token, the token to resume from next time)."""
+        kwargs = {"driveId": self.drive_id} if self.drive_id else {}
+        changes = []
+        while True:
+            response = self.service().changes().list(
+                pageToken=page_token, pageSize=config.DRIVE_PAGE_SIZE, supportsAllDrives=True,
+                includeItemsFromAllDrives=True, includeRemoved=True,
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))",
+                **kwargs).execute()
+            changes.extend(response.get('changes', []))
+            if 'newStartPageToken' in response:
+                return changes, response['newStartPageToken']
+            page_token = response['nextPageToken']
+
+    def download(self, file_id: str) -> bytes:
+        return self.service().files().get_media(fileId=file_id, supportsAllDrives=True).execute()
+
+def _build_service(creds):
+    from googleapiclient.discovery import build
+    return build('drive', 'v3', credentials=creds, cache_discovery=False)
+
+# --- Delta Sync ---
+class DriveSync:
+    """
+    Tracks a Drive folder tree between builds with the Changes API. The first sync (or any sync
+    whose state no longer applies) crawls the whole tree and records a start page token; later
+    syncs only read the changes since that token. State is a small JSON-serialisable dict:
+
+        {"folder_id": ..., "page_token": ..., "folders": [...], "retry": [...]}
+
+    where "retry" holds files whose last build failed, so they are fetched again even though
+    the change that touched them has already been consumed.
+    """
+
+    def __init__(self, source: DriveSource, state: dict | None = None):
+        self.source = source
+        self.state = state if state and state.get("folder_id") == source.folder_id else None
+
+    def sync(self) -> dict:
+        """
+        Returns {"full_scan": bool, "files": [...], "removed": set of file ids}. On a full scan
+        "files" is every file in the tree; otherwise it is only files created or modified since
+        the last sync, and "removed" holds ids that were deleted, trashed or moved out of the tree.
+        """
+        if self.state:
+            try:
+                delta = self._apply_changes()
+                if delta is not None:
+                    return delta
+            except Exception as e:
+                # An expired or invalid token is recovered from with a full crawl.
+                print(f"Could not read Drive changes ({e}); falling back to a full folder scan.")
+        # Take the token before crawling so changes made during the crawl are seen next time.
+        page_token = self.source.get_start_page_token()
+        files, folders = self.source.crawl()
+        self.state = {"folder_id": self.source.folder_id, "page_token": page_token,
+                      "folders": sorted(folders), "retry": []}
+        print(f"Drive full scan: {len(files)} file(s) in {len(folders)} folder(s).")
+        return {"full_scan": True, "files": files, "removed": set()}
+
+    def _apply_changes(self) -> dict | None:
+        """Applies the change feed to the known folder tree; returns None when a full crawl is needed."""
+        changes, new_page_token = self.source.list_changes(self.state["page_token"])
+        folders = set(self.state["folders"])
+        changed, removed = {}, set()
+        for change in changes:
+            file, file_id = change.get('file') or {}, change['fileId']
+            in_tree = not change.get('removed') and not file.get('trashed') and \
+                any(parent in folders for parent in file.get('parents', []))
+            if file.get('mimeType') == FOLDER_MIME_TYPE or file_id in folders:
+                if file_id in folders and not in_tree and file_id != self.source.folder_id:
+                    # A folder left the tree; its files are not listed in the feed, so rescan.
+                    print(f"Drive folder {file_id} left the synced tree; rescanning.")
+                    return None
+                if in_tree and file_id not in folders:
+                    # A folder moved into the tree brings its existing contents with it.
+                    sub_files, sub_folders = self.source.crawl(file_id)
+                    folders |= sub_folders
+                    changed.update((item['id'], item) for item in sub_files)
+                    removed -= {item['id'] for item in sub_files}
+                continue
+            if in_tree:
+                changed[file_id] = file
+                removed.discard(file_id)
+            else:
+                changed.pop(file_id, None)
+                removed.add(file_id)
+        for file_id in self.state.get("retry", []):
+            if file_id not in changed and file_id not in removed:
+                try:
+                    changed[file_id] = self.source.get_file(file_id)
+                except Exception as e:
+                    print(f"Could not re-fetch Drive file {file_id}: {e}")
+        self.state = {"folder_id": self.source.folder_id, "page_token": new_page_token,
+                      "folders": sorted(folders), "retry": []}
+        print(f"Drive delta sync: {len(changes)} change(s), {len(changed)} file(s) to check, {len(removed)} removed.")
+        return {"full_scan": False, "files": list(changed.values()), "removed": removed}
+
+    def finish(self, failed_file_ids) -> dict:
+        """Returns the state to store with the build, remembering files that must be retried."""
+        return {**self.state, "retry": sorted(failed_file_ids)}
+
+# --- Streaming Downloads ---
+def stream_downloads(items, download, max_workers: int | None = None, max_in_flight: int | None = None):
+    """
+    Runs download(item) on a thread pool and yields (item, bytes, error) as each finishes.
+    Items are pulled lazily and at most max_in_flight downloads are pending or unconsumed,
+    so peak memory is bounded by that window rather than by the number of files.
+    """
+    max_workers = max_workers or config.DRIVE_DOWNLOAD_WORKERS
+    max_in_flight = max_in_flight or max_workers * 2
+    items = iter(items)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download") as executor:
+        def fill():
+            while len(pending) < max_in_flight:
+                item = next(items, None)
+                if item is None:
+                    return
+                pending[executor.submit(download, item)] = item
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, f"{type(e).__name__}: {e}"
+            fill()
@@ -0,0 +1,164 @@
+# embedding_cache.py
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+import config
+from caches import LRUCache, HitCounter, normalize_query, format_cache_stats
+from embedding_pipeline import embed_in_batches
+
+def create_openai_embeddings() -> OpenAIEmbeddings:
+    """OpenAI embeddings client, or a client for the local stand-in server when EMBEDDING_API_BASE is set."""
+    if config.EMBEDDING_API_BASE:
+        # Stand-in servers take plain strings rather than tiktoken-encoded inputs.
+        return OpenAIEmbeddings(model=config.OPENAI_EMBEDDING_MODEL, base_url=config.EMBEDDING_API_BASE,
+                                api_key="local", check_embedding_ctx_length=False)
+    return OpenAIEmbeddings(model=config.OPENAI_EMBEDDING_MODEL)
+
+def embedding_cache_key(model_name: str) -> str:
+    """
+    Model key under which vectors are cached. Vectors from a stand-in server (EMBEDDING_API_BASE)
+    are kept apart from the real model's, so a later OpenAI build can never reuse them.
+    """
+    return f"{model_name}@{config.EMBEDDING_API_BASE}" if config.EMBEDDING_API_BASE else model_name
+
+# --- Persistent Vector Store (SQLite) ---
+class EmbeddingStore:
+    """
+    On-disk float32 vectors keyed by (namespace, model, key). Survives restarts and is
+    safe to share between threads; WAL mode lets several processes read concurrently.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "namespace TEXT NOT NULL, model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (namespace, model, key))"
+            )
+
+    def get_many(self, namespace: str, model: str, keys: list[str]) -> dict:
+        """Returns {key: vector} for the keys that are stored; missing keys are simply absent."""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay well under SQLite's bound-parameter limit.
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE namespace = ? AND model = ? AND key IN ({placeholders})",
+                    [namespace, model, *batch],
+                ).fetchall()
+            found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+        return found
+
+    def put_many(self, namespace: str, model: str, items: list[tuple[str, list[float]]]):
+        rows = [(namespace, model, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+
+    def prune(self, namespace: str, max_rows: int) -> int:
+        """Keeps the max_rows most recently stored vectors of a namespace; returns how many were deleted."""
+        with self._lock, self._conn:
+            # INSERT OR REPLACE gives a re-stored row a new rowid, so rowid order is storage order.
+            return self._conn.execute(
+                "DELETE FROM embeddings WHERE namespace = ? AND rowid NOT IN "
+                "(SELECT rowid FROM embeddings WHERE namespace = ? ORDER BY rowid DESC LIMIT ?)",
+                (namespace, namespace, max_rows)).rowcount
+
+# --- Two-Tier Query Embedding Cache ---
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model so embed_query() is answered from an in-process LRU, then the
+    on-disk store, and only then the embedding API. embed_documents() is passed through.
+    """
+
+    def __init__(self, base: Embeddings, model_name: str, store: EmbeddingStore, memory_cache: LRUCache,
+                 store_counter: HitCounter | None = None):
+        self.base = base
+        self.model_name = model_name
+        self.store = store
+        self.memory_cache = memory_cache
+        self.store_counter = store_counter or HitCounter()
+
+    def embed_query(self, text: str) -> list[float]:
+        key = normalize_query(text)
+        vector = self.memory_cache.get((self.model_name, key))
+        if vector is None:
+            vector = self.store.get_many("query", self.model_name, [key]).get(key)
+            self.store_counter.record(vector is not None)
+            if vector is None:
+                vector = np.asarray(self.base.embed_query(text), dtype=np.float32)
+                self.store.put_many("query", self.model_name, [(key, vector)])
+            self.memory_cache.put((self.model_name, key), vector)
+        return vector.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.base.embed_documents(texts)
+
+_embedding_store: EmbeddingStore | None = None
+_query_memory_cache = LRUCache(config.QUERY_EMBEDDING_CACHE_SIZE)
+_query_store_counter = HitCounter()
+_store_lock = threading.Lock()
+
+def get_embedding_store() -> EmbeddingStore:
+    """Returns the process-wide on-disk embedding store, opening it on first use."""
+    global _embedding_store
+    if _embedding_store is None:
+        with _store_lock:
+            if _embedding_store is None:
+                store = EmbeddingStore(config.EMBEDDING_CACHE_PATH)
+                # Every distinct query adds a row, so the query tier is capped; chunk vectors are kept.
+                pruned = store.prune("query", config.QUERY_EMBEDDING_STORE_MAX_ROWS)
+                if pruned:
+                    print(f"Pruned {pruned} old query embedding(s) from {config.EMBEDDING_CACHE_PATH}.")
+                _embedding_store = store
+    return _embedding_store
+
+def get_cached_query_embeddings(base: Embeddings, model_name: str) -> CachedQueryEmbeddings:
+    """Wraps base with the shared query cache; the memory tier outlives KB generation swaps."""
+    return CachedQueryEmbeddings(base, embedding_cache_key(model_name), get_embedding_store(), _query_memory_cache,
+                                 _query_store_counter)
+
+def get_query_cache_stats() -> dict:
+    """Hit/miss counters of both query embedding tiers; disk lookups only happen on memory misses."""
+    return {"memory": _query_memory_cache.stats(), "disk": _query_store_counter.stats()}
+
+def format_query_cache_stats() -> str:
+    stats = get_query_cache_stats()
+    return (f"Query embedding cache: memory {format_cache_stats(stats['memory'])}; "
+            f"disk {format_cache_stats(stats['disk'])}")
+
+# --- Content-Addressed Chunk Embeddings (KB builds) ---
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def embed_chunks_with_cache(texts: list[str], embeddings: Embeddings, model_name: str) -> tuple[list, dict]:
+    """
+    Embeds chunk texts, reusing stored vectors for any text whose hash has been embedded
+    before. Returns (vectors in input order, {"reused": n, "computed": n}).
+    """
+    store = get_embedding_store()
+    cache_key = embedding_cache_key(model_name)
+    hashes = [chunk_hash(text) for text in texts]
+    vectors_by_hash = store.get_many("chunk", cache_key, hashes)
+    reused = sum(1 for h in hashes if h in vectors_by_hash)
+
+    # Identical texts within one build are embedded once. Every completed batch is written to the
+    # store straight away, so a build that dies part-way reuses those vectors when it is re-run.
+    missing = {h: text for h, text in zip(hashes, texts) if h not in vectors_by_hash}
+    if missing:
+        new_vectors = embed_in_batches(list(missing.items()), embeddings, model_name,
+                                       on_batch_done=lambda items: store.put_many("chunk", cache_key, items))
+        vectors_by_hash.update((h, np.asarray(v, dtype=np.float32)) for h, v in new_vectors.items())
+
+    vectors = [vectors_by_hash[h] for h in hashes]
+    return vectors, {"reused": reused, "computed": len(texts) - reused}
@@ -0,0 +1,82 @@
+# embedding_pipeline.py
+import time
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from langchain_core.embeddings import Embeddings
+import config
+
+def get_token_counter(model_name: str):
+    """Returns a text -> token count function, using tiktoken when its encoding can be loaded."""
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        # tiktoken missing, or its encoding file cannot be downloaded (offline builds): estimate instead.
+        return lambda text: len(text) // 4 + 1
+
+def _pack_batch(queue: deque, token_budget: int, max_items: int) -> list:
+    """Pops items off the front of the queue until the batch would exceed the token budget."""
+    batch, batch_tokens = [], 0
+    while queue and len(batch) < max_items:
+        tokens = queue[0][2]
+        # An oversized single text still goes out, alone in its batch.
+        if batch and batch_tokens + tokens > token_budget:
+            break
+        batch.append(queue.popleft())
+        batch_tokens += tokens
+    return batch
+
+# --- Batched, Overlapping Embedding Requests ---
+def embed_in_batches(items: list[tuple[str, str]], embeddings: Embeddings, model_name: str,
+                     on_batch_done=None) -> dict:
+    """
+    Embeds (key, text) items in token-budgeted batches with several requests in flight.
+    on_batch_done(list of (key, vector)) is called as each batch completes, which lets the
+    caller checkpoint progress so an interrupted build resumes instead of restarting.
+    A failed batch is retried with jittered backoff and the batch budget is halved (and
+    then grown back on success), so oversize or throttled batches adapt instead of failing
+    the whole build. Returns {key: vector}.
+    """
+    max_budget = config.EMBEDDING_BATCH_TOKENS
+    max_items = config.EMBEDDING_BATCH_MAX_ITEMS
+    count_tokens = get_token_counter(model_name)
+    # Queue entries: (key, text, tokens, attempt)
+    queue = deque((key, text, count_tokens(text), 0) for key, text in items)
+    token_budget = max_budget
+    results, in_flight = {}, {}
+    total, started_at = len(queue), time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=config.EMBEDDING_MAX_IN_FLIGHT, thread_name_prefix="embed") as executor:
+        while queue or in_flight:
+            while queue and len(in_flight) < config.EMBEDDING_MAX_IN_FLIGHT:
+                batch = _pack_batch(queue, token_budget, max_items)
+                future = executor.submit(embeddings.embed_documents, [text for _, text, _, _ in batch])
+                in_flight[future] = batch
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                try:
+                    vectors = future.result()
+                except Exception as e:
+                    attempt = max(entry[3] for entry in batch) + 1
+                    if attempt > config.EMBEDDING_MAX_RETRIES:
+                        raise RuntimeError(f"Embedding batch of {len(batch)} chunks failed after "
+                                           f"{config.EMBEDDING_MAX_RETRIES} retries: {e}") from e
+                    token_budget = max(1, token_budget // 2)
+                    print(f"Embedding batch failed ({e}); retrying with a {token_budget}-token budget.")
+                    queue.extendleft(reversed([(key, text, tokens, attempt) for key, text, tokens, _ in batch]))
+                    time.sleep(random.uniform(0, min(config.EMBEDDING_MAX_BACKOFF_SECONDS, 2 ** attempt)))
+                    continue
+                completed = [(key, vector) for (key, _, _, _), vector in zip(batch, vectors)]
+                results.update(completed)
+                if on_batch_done:
+                    on_batch_done(completed)
+                token_budget = min(max_budget, int(token_budget * 1.25) + 1)
+                print(f"Embedded {len(results)}/{total} chunks ({time.monotonic() - started_at:.1f}s).")
+    return results
@@ -0,0 +1,160 @@
+# enrichment.py
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import Future
+import openai
+import config
+
+ENRICHMENT_FALLBACK = {"summary": "N/A", "keywords": []}
+_RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+def build_enrichment_prompt(content: str) -> str:
+    return f"""
+        Based on the following document content, generate a concise 1-2 sentence summary and a list of 5-7 relevant keywords.
+        Provide the output in a clean JSON format: {{"summary": "...", "keywords": ["kw1", "kw2", ...]}}
+
+        DOCUMENT CONTENT:
+        {content[:config.ENRICHMENT_MAX_CHARS]}
+        """
+
+def parse_enrichment_response(response_text: str) -> dict:
+    json_match = re.search(r'\{.*\}', response_text or "", re.DOTALL)
+    if json_match:
+        return json.loads(json_match.group(0))
+    return dict(ENRICHMENT_FALLBACK)
+
+# --- Enrichment Cache (keyed by content hash) ---
+class EnrichmentCache:
+    """SQLite map from the hash of (model, prompt content) to the enrichment JSON."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS enrichments (content_hash TEXT PRIMARY KEY, data TEXT NOT NULL)")
+
+    @staticmethod
+    def key(model: str, content: str) -> str:
+        return hashlib.sha256(f"{model}\n{content[:config.ENRICHMENT_MAX_CHARS]}".encode("utf-8")).hexdigest()
+
+    def get(self, content_hash: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM enrichments WHERE content_hash = ?", (content_hash,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, content_hash: str, data: dict):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO enrichments VALUES (?, ?)", (content_hash, json.dumps(data)))
+
+    def close(self):
+        self._conn.close()
+
+# --- Rate Limiting ---
+class AsyncTokenBucket:
+    """Refills at rate_per_minute; acquire() waits until enough tokens are available."""
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+# --- Concurrent Enrichment Stage ---
+class EnrichmentStage:
+    """
+    Enriches documents with an LLM summary and keywords on a background asyncio loop, sharing
+    one AsyncOpenAI client. Requests run with bounded concurrency, request- and token-per-minute
+    buckets, and jittered exponential backoff on retryable errors. Results are cached by content
+    hash, so unchanged documents are never sent again. Use as a context manager:
+
+        with EnrichmentStage() as stage:
+            future = stage.submit(content, file_name)
+            enrichment = future.result()
+    """
+
+    def __init__(self, model: str | None = None, concurrency: int | None = None):
+        self.model = model or config.OPENAI_MODEL_NAME
+        self.concurrency = concurrency or config.ENRICHMENT_CONCURRENCY
+        self.cache = EnrichmentCache(config.ENRICHMENT_CACHE_PATH)
+        self.stats = {"cached": 0, "enriched": 0, "failed": 0}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="enrichment-loop", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, *exc_info):
+        asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self.cache.close()
+
+    async def _start(self):
+        # Loop-bound primitives must be created on the loop's own thread.
+        self._client = openai.AsyncOpenAI(max_retries=0)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._request_bucket = AsyncTokenBucket(config.ENRICHMENT_REQUESTS_PER_MINUTE)
+        self._token_bucket = AsyncTokenBucket(config.ENRICHMENT_TOKENS_PER_MINUTE)
+
+    def submit(self, content: str, file_name: str) -> Future:
+        """Schedules enrichment of one document and returns a Future for its metadata dict."""
+        content_hash = EnrichmentCache.key(self.model, content)
+        cached = self.cache.get(content_hash)
+        if cached is not None:
+            self.stats["cached"] += 1
+            future = Future()
+            future.set_result(cached)
+            return future
+        return asyncio.run_coroutine_threadsafe(self._enrich(content, file_name, content_hash), self._loop)
+
+    async def _enrich(self, content: str, file_name: str, content_hash: str) -> dict:
+        prompt = build_enrichment_prompt(content)
+        # Rough token estimate (~4 characters per token) plus room for the reply.
+        estimated_tokens = len(prompt) / 4 + 200
+        async with self._semaphore:
+            for attempt in range(config.ENRICHMENT_MAX_RETRIES + 1):
+                await self._request_bucket.acquire()
+                await self._token_bucket.acquire(estimated_tokens)
+                try:
+                    print(f"--> Enriching document: {file_name}")
+                    response = await self._client.chat.completions.create(
+                        model=self.model, messages=[{"role": "user", "content": prompt}], temperature=0.2)
+                    enrichment = parse_enrichment_response(response.choices[0].message.content)
+                    self.cache.put(content_hash, enrichment)
+                    self.stats["enriched"] += 1
+                    return enrichment
+                except _RETRYABLE_ERRORS as e:
+                    if attempt == config.ENRICHMENT_MAX_RETRIES:
+                        print(f"Could not enrich document {file_name}. Error: {e}")
+                        break
+                    # Full jitter keeps many concurrent retries from hitting the API in lockstep.
+                    delay = random.uniform(0, min(config.ENRICHMENT_MAX_BACKOFF_SECONDS, 2 ** attempt))
+                    await asyncio.sleep(delay)
+                except Exception as e:
+                    print(f"Could not enrich document {file_name}. Error: {e}")
+                    break
+        self.stats["failed"] += 1
+        return dict(ENRICHMENT_FALLBACK)
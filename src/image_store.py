@@ -0,0 +1,89 @@
+# image_store.py
+import os
+import re
+import uuid
+import hashlib
+import config
+from kb_store import read_sources
+
+# --- On-Disk Layout ---
+# image_store/
+#   <sha256 of image bytes>.<ext>         <- one copy per distinct image, shared across documents and builds
+#   thumbnails/<sha256>_<size>.jpg        <- created on first use at retrieval time
+# Which images are live is recorded per source in the generation's sources.json ("images"),
+# so prune_images() can drop the ones no generation on disk refers to.
+
+_IMAGE_SIGNATURES = {b"\x89PNG": "png", b"\xff\xd8\xff": "jpg", b"GIF8": "gif", b"BM": "bmp",
+                     b"II*\x00": "tif", b"MM\x00*": "tif", b"RIFF": "webp"}
+_STORED_IMAGE = re.compile(r"^[0-9a-f]{64}\.\w+$")
+
+def _image_extension(image_bytes: bytes) -> str:
+    for signature, ext in _IMAGE_SIGNATURES.items():
+        if image_bytes.startswith(signature):
+            return ext
+    return "jpg"
+
+def store_image(image_bytes: bytes) -> str:
+    """Stores image bytes under their content hash and returns the path; identical images are written once."""
+    os.makedirs(config.IMAGE_STORE_PATH, exist_ok=True)
+    file_name = f"{hashlib.sha256(image_bytes).hexdigest()}.{_image_extension(image_bytes)}"
+    path = os.path.join(config.IMAGE_STORE_PATH, file_name)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(image_bytes)
+        os.replace(tmp_path, path)
+    return path
+
+# --- Thumbnails ---
+def get_thumbnail(image_path: str, max_size: int | None = None) -> str:
+    """
+    Returns the path of a JPEG thumbnail no larger than max_size pixels on its longest edge,
+    creating and caching it on first use. Falls back to the original image if it cannot be
+    decoded or Pillow is not installed.
+    """
+    max_size = max_size or config.IMAGE_THUMBNAIL_SIZE
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    thumbnail_dir = os.path.join(os.path.dirname(image_path), "thumbnails")
+    thumbnail_path = os.path.join(thumbnail_dir, f"{stem}_{max_size}.jpg")
+    if os.path.exists(thumbnail_path):
+        return thumbnail_path
+    try:
+        from PIL import Image
+        with Image.open(image_path) as image:
+            if max(image.size) <= max_size and image.format == "JPEG":
+                return image_path
+            image.thumbnail((max_size, max_size))
+            os.makedirs(thumbnail_dir, exist_ok=True)
+            tmp_path = f"{thumbnail_path}.{uuid.uuid4().hex}.tmp"
+            image.convert("RGB").save(tmp_path, format="JPEG", quality=85)
+        os.replace(tmp_path, thumbnail_path)
+        return thumbnail_path
+    except Exception as e:
+        print(f"Could not create a thumbnail for {image_path}: {e}")
+        return image_path
+
+# --- Garbage Collection ---
+def prune_images():
+    """Deletes stored images (and their thumbnails) no longer referenced by any generation still on disk."""
+    if not os.path.isdir(config.IMAGE_STORE_PATH) or not os.path.isdir(config.KB_STORE_PATH):
+        return
+    referenced = set()
+    for generation in os.listdir(config.KB_STORE_PATH):
+        if not os.path.isdir(os.path.join(config.KB_STORE_PATH, generation)):
+            continue
+        for entry in (read_sources(generation) or {}).values():
+            referenced.update(entry.get("images", []))
+    removed = set()
+    for file_name in os.listdir(config.IMAGE_STORE_PATH):
+        # Only content-addressed files are collected; images from older builds are not tracked in sources.json.
+        if _STORED_IMAGE.match(file_name) and file_name not in referenced:
+            os.remove(os.path.join(config.IMAGE_STORE_PATH, file_name))
+            removed.add(os.path.splitext(file_name)[0])
+    thumbnail_dir = os.path.join(config.IMAGE_STORE_PATH, "thumbnails")
+    if removed and os.path.isdir(thumbnail_dir):
+        for file_name in os.listdir(thumbnail_dir):
+            if file_name.rsplit("_", 1)[0] in removed:
+                os.remove(os.path.join(thumbnail_dir, file_name))
+    if removed:
+        print(f"Removed {len(removed)} unreferenced image(s) from {config.IMAGE_STORE_PATH}.")
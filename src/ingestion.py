@@ -0,0 +1,111 @@
+# ingestion.py
+import time
+import multiprocessing as mp
+from multiprocessing.connection import wait
+import config
+
+# --- Isolated Worker Processes ---
+def _worker_loop(conn):
+    """Runs tasks sent over the pipe until told to stop. Errors are sent back as strings."""
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        func, args = task
+        try:
+            result = (True, func(*args))
+        except Exception as e:
+            # Exceptions from third-party parsers are not always picklable, so send a description.
+            result = (False, f"{type(e).__name__}: {e}")
+        conn.send(result)
+
+class _Worker:
+    """One long-lived worker process. Tracking which task each worker holds lets a hung or
+    crashed file be killed and blamed without affecting the files running next to it."""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_loop, args=(child_conn,))
+        self.process.start()
+        child_conn.close()
+        self.item = None
+        self.deadline = None
+
+    def submit(self, func, item, args, timeout_seconds: float):
+        self.item = item
+        self.deadline = time.monotonic() + timeout_seconds
+        self.conn.send((func, args))
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+def run_in_process_pool(func, items, args_for, max_workers: int | None = None,
+                        timeout_seconds: float | None = None):
+    """
+    Runs func(*args_for(item)) for every item on a pool of worker processes and yields
+    (item, result, error) as each one finishes, in completion order. Items are pulled from
+    the iterable lazily, so at most max_workers of them are in flight at once. A task that
+    raises, crashes its worker or runs past timeout_seconds is reported with an error and
+    its worker is replaced; the remaining tasks carry on. Workers are started with
+    PARTITION_START_METHOD ("spawn" by default), so func must be importable at module level.
+    """
+    max_workers = max_workers or config.PARTITION_WORKERS
+    timeout_seconds = timeout_seconds or config.PARTITION_TIMEOUT_SECONDS
+    ctx = mp.get_context(config.PARTITION_START_METHOD)
+    items = iter(items)
+    workers = [_Worker(ctx) for _ in range(max_workers)]
+    exhausted = False
+    try:
+        while True:
+            # Hand the next items to idle workers.
+            for i, worker in enumerate(workers):
+                if worker.item is None and not exhausted:
+                    item = next(items, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    if not worker.process.is_alive():
+                        workers[i] = worker = _Worker(ctx)
+                    worker.submit(func, item, args_for(item), timeout_seconds)
+            busy = [w for w in workers if w.item is not None]
+            if not busy:
+                return
+
+            wait_for = max(0.0, min(w.deadline for w in busy) - time.monotonic())
+            ready = wait([w.conn for w in busy] + [w.process.sentinel for w in busy], timeout=wait_for)
+            for i, worker in enumerate(workers):
+                if worker.item is None:
+                    continue
+                item, result, error, replace = worker.item, None, None, False
+                if worker.conn in ready:
+                    try:
+                        ok, payload = worker.conn.recv()
+                        result, error = (payload, None) if ok else (None, payload)
+                    except (EOFError, OSError):
+                        error, replace = "Worker process crashed", True
+                elif worker.process.sentinel in ready:
+                    error, replace = f"Worker process crashed (exit code {worker.process.exitcode})", True
+                elif time.monotonic() >= worker.deadline:
+                    error, replace = f"Timed out after {timeout_seconds:.0f}s", True
+                else:
+                    continue
+                if replace:
+                    worker.kill()
+                    workers[i] = _Worker(ctx)
+                else:
+                    worker.item = None
+                yield item, result, error
+    finally:
+        for worker in workers:
+            worker.stop()
@@ -0,0 +1,228 @@
+# kb_segments.py
+import os
+import gc
+import pickle
+import shutil
+import threading
+import numpy as np
+import config
+from bm25_index import SparseBM25Index
+from embedding_cache import embed_chunks_with_cache
+from parent_store import ParentStore, ChunkStore, open_parent_store
+from vector_index import (update_ann_index, save_ann_index, describe_index, create_flat_index,
+                          save_flat_store, load_flat_store)
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# --- Segmented Index Writer ---
+class SegmentWriter:
+    """
+    Streams child chunks and parents into on-disk segments of at most segment_chunks chunks.
+    Each segment holds its own FAISS index, BM25 postings and chunk and parent pickles, so the
+    builder only keeps one segment's documents in memory. merge() combines the segments with the previous
+    generation into the final artifacts and removes them.
+
+        writer = SegmentWriter(segments_dir, embeddings)
+        writer.add(parent_doc, sub_docs)   # flushes a segment whenever the buffer is full
+        writer.merge(paths, previous_paths, removed_chunk_ids, removed_parent_ids)
+    """
+
+    def __init__(self, segments_dir: str, embeddings, segment_chunks: int | None = None):
+        self.segments_dir = segments_dir
+        self.embeddings = embeddings
+        self.segment_chunks = segment_chunks or config.BUILD_SEGMENT_CHUNKS
+        self.segments = []
+        self.embedding_stats = {"reused": 0, "computed": 0}
+        self.chunk_count = 0
+        self.parent_count = 0
+        self._parents, self._children = [], []
+
+    def add(self, parent_doc, sub_docs: list):
+        self._parents.append(parent_doc)
+        self.parent_count += 1
+        self.add_children(sub_docs)
+
+    def add_children(self, sub_docs: list):
+        """Adds more child chunks of an already added parent (e.g. a large table's rows, batch by batch)."""
+        self._children.extend(sub_docs)
+        self.chunk_count += len(sub_docs)
+        if len(self._children) >= self.segment_chunks:
+            self.flush()
+
+    def flush(self):
+        """Embeds and indexes the buffered chunks into a new segment, then drops them from memory."""
+        if not self._children and not self._parents:
+            return
+        segment_dir = os.path.join(self.segments_dir, f"{len(self.segments):05d}")
+        os.makedirs(segment_dir)
+        if self._children:
+            texts = [doc.page_content for doc in self._children]
+            chunk_ids = [doc.metadata["chunk_id"] for doc in self._children]
+            # Unchanged chunks reuse their stored vectors; only new or edited text hits the embedding API.
+            vectors, stats = embed_chunks_with_cache(texts, self.embeddings, config.OPENAI_EMBEDDING_MODEL)
+            for key in self.embedding_stats:
+                self.embedding_stats[key] += stats[key]
+            save_flat_store(os.path.join(segment_dir, "index"), create_flat_index(vectors), chunk_ids)
+            SparseBM25Index.from_tokenized([text.split(" ") for text in texts], chunk_ids=chunk_ids).save(
+                os.path.join(segment_dir, "bm25"))
+            with open(os.path.join(segment_dir, "chunks.pkl"), "wb") as f:
+                pickle.dump(list(zip(chunk_ids, self._children)), f)
+        with open(os.path.join(segment_dir, "parents.pkl"), "wb") as f:
+            pickle.dump([(parent_doc.metadata["doc_id"], parent_doc) for parent_doc in self._parents], f)
+        self.segments.append(segment_dir)
+        print(f"Flushed segment {len(self.segments)}: {len(self._children)} chunks, {len(self._parents)} parents "
+              f"(RSS now {_format_mb(current_rss_mb())}).")
+        self._parents, self._children = [], []
+        gc.collect()
+
+    def merge(self, paths: dict, previous_paths: dict | None, removed_chunk_ids: list, removed_parent_ids: list):
+        """Writes the final FAISS index, chunk and parent stores and BM25 index of a generation from the previous one plus all segments."""
+        self.flush()
+        index, chunk_ids = None, []
+        if previous_paths:
+            index, chunk_ids, docstore = load_flat_store(previous_paths["index"])
+            chunk_store = _copy_chunk_store(previous_paths, paths["chunk_store"], docstore)
+            del docstore
+            if removed_chunk_ids:
+                removed = set(removed_chunk_ids)
+                index.remove_ids(np.array([pos for pos, chunk_id in enumerate(chunk_ids) if chunk_id in removed],
+                                          dtype=np.int64))
+                chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id not in removed]
+                chunk_store.mdelete(removed_chunk_ids)
+        else:
+            chunk_store = ChunkStore(paths["chunk_store"])
+        for segment_dir in self.segments:
+            if not os.path.isdir(os.path.join(segment_dir, "index")):
+                continue
+            segment_index, segment_ids, _ = load_flat_store(os.path.join(segment_dir, "index"))
+            if index is None:
+                index = segment_index
+            else:
+                index.merge_from(segment_index)
+            chunk_ids += segment_ids
+            del segment_index
+            with open(os.path.join(segment_dir, "chunks.pkl"), "rb") as f:
+                chunk_store.mset(pickle.load(f))
+        chunk_store.close()
+        print(f"Chunk store saved to {paths['chunk_store']}")
+        save_flat_store(paths["index"], index, chunk_ids)
+        print(f"FAISS index saved to {paths['index']}")
+        ann_index, ann_info = update_ann_index(index, (previous_paths or {}).get("ann_index"),
+                                               vectors_removed=bool(previous_paths and removed_chunk_ids))
+        if ann_index is not None:
+            save_ann_index(ann_index, paths["ann_index"], ann_info)
+            print(f"ANN index saved to {paths['ann_index']}: {describe_index(ann_index)}")
+            del ann_index
+        del index, chunk_ids
+        gc.collect()
+
+        if previous_paths:
+            # Start from a copy of the previous parents and apply this build's changes to it.
+            previous_store = open_parent_store(previous_paths)
+            if isinstance(previous_store, ParentStore):
+                parent_store = previous_store.copy_to(paths["parent_store"])
+                previous_store.close()
+            else:
+                # Generations built before the SQLite store pickled an InMemoryStore.
+                parent_store = ParentStore(paths["parent_store"])
+                parent_store.mset(list(previous_store.store.items()))
+            del previous_store
+            parent_store.mdelete(removed_parent_ids)
+        else:
+            parent_store = ParentStore(paths["parent_store"])
+        for segment_dir in self.segments:
+            with open(os.path.join(segment_dir, "parents.pkl"), "rb") as f:
+                parent_store.mset(pickle.load(f))
+        parent_store.close()
+        print(f"Parent document store saved to {paths['parent_store']}")
+        gc.collect()
+
+        # Segment postings are memory-mapped, so merging never loads any chunk text.
+        bm25_parts = [SparseBM25Index.load(previous_paths["bm25"])] if previous_paths else []
+        bm25_parts += [SparseBM25Index.load(os.path.join(segment_dir, "bm25")) for segment_dir in self.segments
+                       if os.path.isdir(os.path.join(segment_dir, "bm25"))]
+        SparseBM25Index.merged(bm25_parts, removed_chunk_ids).save(paths["bm25"])
+        print(f"BM25 index saved to {paths['bm25']}")
+        del bm25_parts
+        shutil.rmtree(self.segments_dir, ignore_errors=True)
+
+def _copy_chunk_store(previous_paths: dict, path: str, docstore) -> ChunkStore:
+    """Starts a generation's chunk store from a copy of the previous one, opened for writing."""
+    if previous_paths.get("chunk_store") and os.path.exists(previous_paths["chunk_store"]):
+        previous_store = ChunkStore(previous_paths["chunk_store"], read_only=True)
+        chunk_store = previous_store.copy_to(path)
+        previous_store.close()
+        return chunk_store
+    # Generations built before the chunk store kept chunk text in the FAISS docstore; move it over once.
+    chunk_store = ChunkStore(path)
+    chunk_store.mset((int(key), doc) for key, doc in docstore._dict.items())
+    return chunk_store
+
+# --- Memory Reporting ---
+def current_rss_mb() -> float | None:
+    """Current resident set size of this process in MB, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _max_rss_mb(who) -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+def _format_mb(value: float | None) -> str:
+    return f"{value:.0f} MB" if value is not None else "n/a"
+
+class MemoryMonitor:
+    """
+    Records the peak memory of one build. ru_maxrss is the lifetime peak of the (long-running app)
+    process, so the builder's own peak is taken by sampling its current RSS in a background thread.
+    Partition workers are separate processes: RUSAGE_CHILDREN reports the largest one that has exited
+    since the process started, which is reported on its own rather than folded into the build peak.
+
+        memory = MemoryMonitor().start()
+        ...build...
+        memory.stop(); memory.summary()
+    """
+
+    def __init__(self, interval_seconds: float = 0.5):
+        self.interval_seconds = interval_seconds
+        self.build_peak_mb = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-monitor", daemon=True)
+
+    def start(self) -> "MemoryMonitor":
+        if self.build_peak_mb is not None:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self._sample()
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.build_peak_mb = max(self.build_peak_mb or 0.0, rss)
+
+    def summary(self) -> dict:
+        return {"build_peak_mb": self.build_peak_mb, "process_peak_mb": _max_rss_mb(resource.RUSAGE_SELF) if resource else None,
+                "largest_worker_mb": _max_rss_mb(resource.RUSAGE_CHILDREN) if resource else None}
+
+    def format(self) -> str:
+        summary = self.summary()
+        return (f"build peak RSS {_format_mb(summary['build_peak_mb'])} (process lifetime peak "
+                f"{_format_mb(summary['process_peak_mb'])}, largest worker process {_format_mb(summary['largest_worker_mb'])})")
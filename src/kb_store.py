@@ -0,0 +1,129 @@
+# kb_store.py
+import os
+import json
+import uuid
+import shutil
+from datetime import datetime
+import config
+
+# --- On-Disk Layout ---
+# kb_store/
+#   CURRENT.json            <- manifest naming the live generation
+#   <generation>/           <- one fully written build
+#       faiss_index_store/  <- flat vectors and position -> chunk id map (older generations: chunk text too)
+#       ann_index.faiss     <- optional IVF/HNSW/PQ copy of the vectors searched at query time (see vector_index.py)
+#       ann_index.json      <- its type and training size, so the next build can reuse it
+#       bm25_index/         <- memory-mapped BM25 postings (see bm25_index.py)
+#       parent_store.sqlite <- parent documents by doc_id (older generations: parent_docstore.pkl)
+#       chunk_store.sqlite  <- child chunks by chunk_id (see parent_store.py)
+#       sources.json        <- per-source content hashes and chunk ids, used by incremental builds
+#       drive_state.json    <- Drive change token and folder tree, used for delta syncs (see drive_source.py)
+
+def get_manifest_path() -> str:
+    return os.path.join(config.KB_STORE_PATH, config.KB_MANIFEST_FILE)
+
+def read_manifest() -> dict | None:
+    """Returns the manifest of the currently published generation, or None if nothing is published."""
+    try:
+        with open(get_manifest_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def get_artifact_paths(generation: str | None) -> dict:
+    """Resolves the index, BM25 and docstore paths for a generation (None = legacy flat layout)."""
+    if generation is None:
+        return {"index": config.INDEX_STORE_PATH, "bm25": config.BM25_INDEX_PATH, "docstore": config.DOCSTORE_PATH}
+    generation_dir = os.path.join(config.KB_STORE_PATH, generation)
+    return {
+        "index": os.path.join(generation_dir, os.path.basename(config.INDEX_STORE_PATH)),
+        "bm25": os.path.join(generation_dir, os.path.basename(config.BM25_INDEX_DIR)),
+        "docstore": os.path.join(generation_dir, os.path.basename(config.DOCSTORE_PATH)),
+        "parent_store": os.path.join(generation_dir, config.PARENT_STORE_FILE),
+        "chunk_store": os.path.join(generation_dir, config.CHUNK_STORE_FILE),
+        "ann_index": os.path.join(generation_dir, "ann_index.faiss"),
+        "sources": os.path.join(generation_dir, "sources.json"),
+        "drive_state": os.path.join(generation_dir, "drive_state.json"),
+    }
+
+def get_current_generation() -> tuple[str | None, dict] | None:
+    """
+    Returns (generation, artifact paths) for whatever readers should load right now.
+    Falls back to the legacy flat files written by older builds, and returns None
+    if no complete knowledge base exists on disk.
+    """
+    manifest = read_manifest()
+    if manifest:
+        generation = manifest["generation"]
+        return generation, get_artifact_paths(generation)
+    legacy_paths = get_artifact_paths(None)
+    if all(os.path.exists(p) for p in legacy_paths.values()):
+        return None, legacy_paths
+    return None
+
+def _read_json_artifact(generation: str, name: str) -> dict | None:
+    try:
+        with open(get_artifact_paths(generation)[name], "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _write_json_artifact(generation: str, name: str, data: dict):
+    path = get_artifact_paths(generation)[name]
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def read_sources(generation: str) -> dict | None:
+    """Returns the source manifest of a generation, or None if it was built without one."""
+    return _read_json_artifact(generation, "sources")
+
+def write_sources(generation: str, sources: dict):
+    """Writes (or atomically replaces) the source manifest of a generation."""
+    _write_json_artifact(generation, "sources", sources)
+
+def read_drive_state(generation: str) -> dict | None:
+    """Returns the Drive sync state stored with a generation, or None if there is none."""
+    return _read_json_artifact(generation, "drive_state")
+
+def write_drive_state(generation: str, state: dict):
+    """Writes (or atomically replaces) the Drive sync state of a generation."""
+    _write_json_artifact(generation, "drive_state", state)
+
+# --- Writing Generations ---
+def create_generation() -> tuple[str, dict]:
+    """Creates an empty generation folder for a new build and returns its id and artifact paths."""
+    generation = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(os.path.join(config.KB_STORE_PATH, generation))
+    return generation, get_artifact_paths(generation)
+
+def publish_generation(generation: str, **manifest_fields) -> dict:
+    """Atomically switches readers to a fully written generation, then prunes old ones."""
+    manifest = {"generation": generation, "built_at": datetime.now().isoformat(), **manifest_fields}
+    manifest_path = get_manifest_path()
+    tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+    prune_generations()
+    return manifest
+
+def discard_generation(generation: str):
+    """Removes a generation folder that was never published (e.g. a failed build)."""
+    shutil.rmtree(os.path.join(config.KB_STORE_PATH, generation), ignore_errors=True)
+
+def prune_generations():
+    """Deletes all but the newest KB_GENERATIONS_TO_KEEP generations, never touching the live one."""
+    manifest = read_manifest()
+    live = manifest["generation"] if manifest else None
+    generations = sorted(
+        (name for name in os.listdir(config.KB_STORE_PATH) if os.path.isdir(os.path.join(config.KB_STORE_PATH, name))),
+        reverse=True,
+    )
+    # Older generations are kept around so processes that are still serving them are not cut off mid-query.
+    for name in generations[config.KB_GENERATIONS_TO_KEEP:]:
+        if name != live:
+            discard_generation(name)
@@ -1,78 +1,67 @@
 # knowledge_base_tools.py
 import os
 import re
-import pickle
-import cohere
-import numpy as np
+import json
 from crewai.tools import tool
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.storage import InMemoryStore
 import config
-
-# --- Cohere Client Initialization ---
-cohere_api_key = os.getenv("COHERE_API_KEY")
-if not cohere_api_key:
-    raise ValueError("COHERE_API_KEY not found in .env file.")
-co = cohere.Client(cohere_api_key)
+from retrieval_engine import get_retrieval_engine
+from rerankers import rerank_candidates, format_rerank_cache_stats
+from embedding_cache import format_query_cache_stats
+from image_store import get_thumbnail
+from context_assembler import ContextAssembler
 
 # --- Main Search Tool ---
 @tool("Knowledge Base Search Tool")  
 def knowledge_base_search_tool(query: str) -> str:
     """
-    Performs Hybrid Search, Re-ranks results, and retrieves parent documents
-    to find the most relevant information in the knowledge base.
+    Performs Hybrid Search, Re-ranks results, and retrieves passages of the parent
+    documents around them to find the most relevant information in the knowledge base.
     """
-    if not all(os.path.exists(p) for p in [config.INDEX_STORE_PATH, config.BM25_INDEX_PATH, config.DOCSTORE_PATH]):
-        return "Knowledge Base is not fully built. Please run the build process."
-    
     try:
-        # Step 1: Load all components
-        embeddings = OpenAIEmbeddings(model=config.OPENAI_EMBEDDING_MODEL)
-        vector_store = FAISS.load_local(config.INDEX_STORE_PATH, embeddings, allow_dangerous_deserialization=True)
-        with open(config.BM25_INDEX_PATH, "rb") as f: bm25_data = pickle.load(f)
-        with open(config.DOCSTORE_PATH, "rb") as f: docstore = pickle.load(f)
+        # Step 1: Get the warm, process-wide retrieval engine (loaded once per KB generation)
+        engine = get_retrieval_engine()
+        if engine is None:
+            return "Knowledge Base is not fully built. Please run the build process."
 
-        # Step 2: Initial Hybrid Search on CHILD documents
-        vector_results = vector_store.similarity_search(query, k=25)
-        tokenized_query = query.lower().split(" ")
-        bm25_scores = bm25_data['index'].get_scores(tokenized_query)
-        top_n_indices = np.argsort(bm25_scores)[::-1][:25]
-        keyword_results = [bm25_data['chunks'][i] for i in top_n_indices if bm25_scores[i] > 0]
-        
-        combined_results = {doc.page_content: doc for doc in vector_results}
-        combined_results.update({doc.page_content: doc for doc in keyword_results})
-        initial_child_docs = list(combined_results.values())
+        # Step 2: Initial Hybrid Search on CHILD documents, fused by chunk id
+        candidate_ids = engine.hybrid_search(query)
+        # Drop ids the docstore no longer has (e.g. a stale BM25 posting), keeping ids and docs aligned.
+        found = [(chunk_id, doc) for chunk_id, doc in zip(candidate_ids, engine.get_chunks(candidate_ids)) if doc is not None]
+        candidate_ids = [chunk_id for chunk_id, _ in found]
+        initial_child_docs = [doc for _, doc in found]
         if not initial_child_docs: return "No relevant information found."
 
         # Step 3: Re-ranking the CHILD documents
         child_doc_texts = [doc.page_content for doc in initial_child_docs]
-        reranked_results = co.rerank(model='rerank-english-v3.0', query=query, documents=child_doc_texts, top_n=5)
+        top_chunk_ids = rerank_candidates(engine.generation, query, candidate_ids, child_doc_texts,
+                                          top_n=config.RERANK_TOP_N)
+        print(format_query_cache_stats())
+        print(format_rerank_cache_stats())
         
-        # Step 4: Retrieve PARENT documents
-        top_child_docs = [initial_child_docs[hit.index] for hit in reranked_results.results]
+        # Step 4: Order the top CHILD documents by rerank score
+        child_docs_by_id = dict(zip(candidate_ids, initial_child_docs))
+        top_child_docs = [child_docs_by_id[chunk_id] for chunk_id in top_chunk_ids]
         
-        parent_ids = list(dict.fromkeys([doc.metadata.get("parent_doc_id") for doc in top_child_docs]))
-        retrieved_parents = docstore.mget(parent_ids)
         # Step 5: Find associated image paths from top children
         image_paths = []
         for child in top_child_docs:
             if "image_path" in child.metadata:
                 image_paths.append(child.metadata["image_path"])
-        # Step 6: Format text output from PARENT documents
+        # Step 6: Format text output from windows of each hit's PARENT document, within the context token budget
         text_context_parts = ["Comprehensive Information Found:\n---"]
-        for parent_doc in retrieved_parents:
-            if parent_doc:
-                text_context_parts.append(
-                    f"Source: {parent_doc.metadata.get('source', 'N/A')}\n"
-                    f"Content: {parent_doc.page_content}\n---"
-                )
+        for passage in ContextAssembler(engine).assemble(top_child_docs):
+            text_context_parts.append(
+                f"Source: {passage['source']}\n"
+                f"Content: {passage['content']}\n---"
+            )
         # Step 7: Return a structured JSON string
+        image_paths = list(dict.fromkeys(image_paths)) # De-duplicate
         final_context = {
             "text_context": "\n".join(text_context_parts),
-            "image_paths": list(dict.fromkeys(image_paths)) # De-duplicate
+            "image_paths": image_paths,
+            # Downscaled copies, created on first use and cached, for anything that embeds the images
+            "thumbnail_paths": [get_thumbnail(path) for path in image_paths if os.path.exists(path)]
         }
-        import json
         return json.dumps(final_context)
         # Step 5: Format output from PARENT documents
         # formatted_results = ["Comprehensive Information Found:\n---"]
@@ -87,7 +76,7 @@ def knowledge_base_search_tool(query: str) -> str:
         # return "\n".join(formatted_results)
 
     except Exception as e:
-        return json.dumps({"text_context": f"An error occurred: {str(e)}", "image_paths": []})
+        return json.dumps({"text_context": f"An error occurred: {str(e)}", "image_paths": [], "thumbnail_paths": []})
 
 # --- Source Formatting Utility Tool ---
 @tool("Source Formatting Tool")
@@ -1,50 +1,34 @@
 # knowledge_kb.py
-import re
 import os
-import io
-import json
-import pickle
+import hashlib
 import uuid
-import openai
-import pandas as pd
+import time
+from collections import deque
 import base64
 import streamlit as st
 import config
 from google_tools import get_creds_from_session
+from kb_store import (
+    create_generation, publish_generation, discard_generation, read_manifest, get_artifact_paths,
+    read_sources, write_sources, read_drive_state, write_drive_state
+)
+from embedding_cache import create_openai_embeddings
+from kb_segments import SegmentWriter, MemoryMonitor
+from ingestion import run_in_process_pool
+from enrichment import EnrichmentStage
+from tabular_ingestion import process_tabular_data, RowSpool
+from partition_planner import (
+    partition_with_plan, plan_page_tasks, extract_pdf_pages, partition_page_range, merge_timings, format_timings
+)
+from table_store import prune_tables
+from image_store import store_image, prune_images
+from chunk_sizing import ChunkSizer, TokenHistogram
 
 # Using 'unstructured' for partitioning and identifying elements
-from unstructured.partition.auto import partition
 from unstructured.documents.elements import Title, NarrativeText, ListItem, Table,Image
 
-from langchain.storage import InMemoryStore
 from langchain_community.docstore.document import Document
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from googleapiclient.discovery import build
-from rank_bm25 import BM25Okapi
-
-# --- Helper function for Document Enrichment ---
-def enrich_document_with_llm(content: str, file_name: str) -> dict:
-    """Uses an LLM to generate a summary and keywords for a document's content."""
-    print(f"--> Enriching document: {file_name}")
-    try:
-        client = openai.OpenAI()
-        prompt = f"""
-        Based on the following document content, generate a concise 1-2 sentence summary and a list of 5-7 relevant keywords.
-        Provide the output in a clean JSON format: {{"summary": "...", "keywords": ["kw1", "kw2", ...]}}
-
-        DOCUMENT CONTENT:
-        {content[:4000]}
-        """
-        response = client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": prompt}], temperature=0.2)
-        response_text = response.choices[0].message.content
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group(0))
-        return {"summary": "N/A", "keywords": []}
-    except Exception as e:
-        print(f"Could not enrich document {file_name}. Error: {e}")
-        return {"summary": "N/A", "keywords": []}
+from drive_source import DriveSource, DriveSync, stream_downloads, GOOGLE_APPS_MIME_PREFIX
 
 # --- Structure-Aware Chunking Function ---
 def chunk_by_structure(elements: list, file_name: str) -> list[Document]:
@@ -72,14 +56,9 @@ def chunk_by_structure(elements: list, file_name: str) -> list[Document]:
                 chunks.append(Document(page_content="\n".join(current_chunk_texts), metadata=current_metadata))
                 current_chunk_texts = []
 
-            # Save the image and create a chunk with its path in the metadata
-            image_uuid = str(uuid.uuid4())
-            image_filename = f"{image_uuid}.jpg"  # Assuming jpeg, adjust if needed
-            image_path = os.path.join(config.IMAGE_STORE_PATH, image_filename)
-
             if hasattr(el, 'image_data'):
-                with open(image_path, "wb") as f:
-                    f.write(base64.b64decode(el.image_data))
+                # Save the image under its content hash and create a chunk with its path in the metadata
+                image_path = store_image(base64.b64decode(el.image_data))
 
                 image_metadata = current_metadata.copy()
                 image_metadata["content_type"] = "image"
@@ -91,125 +70,376 @@ def chunk_by_structure(elements: list, file_name: str) -> list[Document]:
                 print(f"Warning: Image data is missing for an Image element in file {file_name}.")
     if current_chunk_texts:
         chunks.append(Document(page_content="\n".join(current_chunk_texts), metadata=current_metadata))
-    return chunks
-
-# --- Tabular Data Processing and Helpers ---
-def process_tabular_data(file_bytes: bytes, file_name: str, file_ext: str) -> list[Document]:
-    documents = []
-    try:
-        df = pd.read_csv(io.BytesIO(file_bytes)) if file_ext == 'csv' else pd.read_excel(io.BytesIO(file_bytes))
-        documents.append(Document(page_content=create_table_overview(df, file_name), metadata={"source": file_name, "content_type": "table_overview"}))
-        documents.extend(create_row_documents(df, file_name, file_ext))
-    except Exception as e:
-        print(f"Error processing tabular data {file_name}: {e}")
-    return documents
-
-def create_table_overview(df: pd.DataFrame, file_name: str) -> str:
-    return (f"Table Overview: {file_name}\n\n"
-            f"Structure: {len(df)} rows, {len(df.columns)} columns: {', '.join(df.columns)}\n\n"
-            f"Sample Data:\n{df.head(3).to_string(index=False)}\n\n"
-            f"Summary Stats:\n{df.describe(include='all').to_string()}")
-
-def create_row_documents(df: pd.DataFrame, file_name: str, file_ext: str) -> list[Document]:
-    documents = []
-    for idx, row in df.iterrows():
-        row_content = f"Record from {file_name} (Row {idx + 1}):\n" + "\n".join([f"- {col}: {val}" for col, val in row.items() if pd.notna(val)])
-        documents.append(Document(page_content=row_content, metadata={"source": file_name, "content_type": "table_row", "row_index": idx}))
-    return documents
+    # Sections are only broken at titles; bound the resulting chunks to CHUNK_MIN/MAX_TOKENS.
+    return ChunkSizer().apply(chunks)
 
 # --- Document Processing Entry Point ---
-def process_document_bytes(file_bytes: bytes, file_name: str) -> tuple[str, list]:
+def process_document_bytes(file_bytes: bytes, file_name: str) -> tuple:
+    """
+    Returns (parent content, elements or child documents, per-strategy partition timings); tables
+    add a fourth item, the RowSpool their row documents were written to chunk by chunk.
+    """
     file_ext = file_name.lower().split('.')[-1]
     if file_ext in ['csv', 'xlsx', 'xls']:
-        child_docs = process_tabular_data(file_bytes, file_name, file_ext)
+        started = time.perf_counter()
+        row_spool = RowSpool()
+        try:
+            child_docs = process_tabular_data(file_bytes, file_name, file_ext, on_rows=row_spool.write)
+        except BaseException:
+            row_spool.discard()
+            raise
+        row_spool.close()
         parent_content = (child_docs[0].page_content if child_docs else "")
-        return parent_content, child_docs
+        return (parent_content, child_docs, {"tabular": {"files": 1, "pages": 0, "seconds": time.perf_counter() - started}},
+                row_spool)
     else:
-        elements = partition(file=io.BytesIO(file_bytes), file_filename=file_name, strategy="hi_res")
+        # The planner picks fast, OCR or hi_res per document (or per page run of a PDF).
+        elements, timings = partition_with_plan(file_bytes, file_name)
         full_content = "\n".join([el.text for el in elements])
-        return full_content, elements
+        return full_content, elements, timings
+
+def partition_task(file_bytes: bytes, file_name: str, page_range: tuple | None):
+    """Worker entry point: a whole document, or one (start, end, strategy) page range of a large PDF."""
+    if page_range is None:
+        return process_document_bytes(file_bytes, file_name)
+    start, end, strategy = page_range
+    started = time.perf_counter()
+    elements = partition_page_range(file_bytes, file_name, start, strategy)
+    return elements, {strategy: {"files": 0, "pages": end - start, "seconds": time.perf_counter() - started}}
+
+def partition_files(files):
+    """
+    Partitions files on the worker pool and yields (file_info, (content, elements, timings), error)
+    per file. PDFs longer than PARTITION_PAGES_PER_TASK pages are split into page-range tasks that
+    run on separate workers; their elements are reassembled in page order before the file is
+    yielded, so chunk_by_structure sees the same stream as from a single partition call.
+    """
+    split_files = {}
+
+    def tasks():
+        for file_info in files:
+            started = time.perf_counter()
+            ranges = plan_page_tasks(file_info["bytes"], file_info["name"])
+            if ranges is None:
+                yield {"file": file_info, "range": None}
+                continue
+            print(f"Splitting {file_info['name']} into {len(ranges)} page-range tasks.")
+            split_files[file_info["key"]] = {
+                "parts": [None] * len(ranges), "returned": 0, "error": None,
+                "timings": {"planning": {"files": 1, "pages": 0, "seconds": time.perf_counter() - started}}}
+            for part, page_range in enumerate(ranges):
+                yield {"file": file_info, "range": page_range, "part": part}
+
+    def task_args(task: dict) -> tuple:
+        file_info, page_range = task["file"], task["range"]
+        if page_range is None:
+            return file_info["bytes"], file_info["name"], None
+        # Only the pages of this range are sent to the worker.
+        return extract_pdf_pages(file_info["bytes"], page_range[0], page_range[1]), file_info["name"], page_range
+
+    for task, result, error in run_in_process_pool(partition_task, tasks(), task_args):
+        file_info = task["file"]
+        if task["range"] is None:
+            yield file_info, result, error
+            continue
+        state = split_files[file_info["key"]]
+        state["returned"] += 1
+        if error:
+            start, end, _ = task["range"]
+            state["error"] = state["error"] or f"pages {start + 1}-{end}: {error}"
+        else:
+            state["parts"][task["part"]] = result
+        # The file's bytes are needed until every range has been handed out, so wait for all of them.
+        if state["returned"] < len(state["parts"]):
+            continue
+        del split_files[file_info["key"]]
+        if state["error"]:
+            yield file_info, None, state["error"]
+            continue
+        elements, timings = [], state["timings"]
+        for part_elements, part_timings in state["parts"]:
+            elements.extend(part_elements)
+            merge_timings(timings, part_timings)
+        for stats in timings.values():
+            stats["files"] = 1
+        yield file_info, ("\n".join([el.text for el in elements]), elements, timings), None
+
+# --- Source Collection ---
+def list_source_files(gdrive_folder_id: str, previous_sources: dict,
+                      drive_state: dict | None = None) -> tuple[list, set, DriveSync | None]:
+    """
+    Lists local and Google Drive files without downloading them. Returns (entries, source
+    prefixes that could not be listed, the Drive sync whose state should be stored with the
+    build); each entry carries a key, name, modified time and a load() callable for the bytes.
+    Drive is crawled recursively on the first build and delta-synced from its change feed after that.
+    """
+    entries, unavailable, drive_sync = [], set(), None
+
+    def read_local_file(file_path: str) -> bytes:
+        with open(file_path, "rb") as f:
+            return f.read()
 
-# --- Main Builder Function ---
-def build_and_save_knowledge_base(gdrive_folder_id: str):
-    """Builds the KB using a Parent-Child strategy with Structure-Aware Chunking."""
-    print("🚀 Starting Knowledge Base build ...")
-    os.makedirs(config.IMAGE_STORE_PATH, exist_ok=True)
-    docstore = InMemoryStore()
-    child_documents = []
-    
-    # --- Step 1: Gather all files to process from sources ---
-    all_files_to_process = []
     local_path = config.LOCAL_DOCUMENT_PATHS[0]
     if os.path.isdir(local_path):
         for filename in os.listdir(local_path):
             file_path = os.path.join(local_path, filename)
             if os.path.isfile(file_path):
-                with open(file_path, "rb") as f:
-                    all_files_to_process.append({"name": filename, "bytes": f.read()})
+                entries.append({"key": f"local:{filename}", "name": filename,
+                                "modified_time": str(os.path.getmtime(file_path)),
+                                "load": lambda p=file_path: read_local_file(p)})
     try:
-        creds = get_creds_from_session()
-        service = build('drive', 'v3', credentials=creds)
-        results = service.files().list(q=f"'{gdrive_folder_id}' in parents and trashed = false", fields="files(id, name)").execute()
-        for item in results.get('files', []):
-            request = service.files().get_media(fileId=item['id'])
-            all_files_to_process.append({"name": item['name'], "bytes": request.execute()})
+        drive = DriveSource(get_creds_from_session(), gdrive_folder_id, drive_id=config.GDRIVE_SHARED_DRIVE_ID)
+        drive_sync = DriveSync(drive, drive_state)
+        delta = drive_sync.sync()
+        items = delta["files"]
+        if not delta["full_scan"]:
+            # Files the change feed did not mention are listed from the previous build as they were.
+            changed_ids = {item['id'] for item in items} | delta["removed"]
+            items = items + [{"id": key[len("gdrive:"):], "name": entry["name"], "modifiedTime": entry["modified_time"]}
+                             for key, entry in previous_sources.items()
+                             if key.startswith("gdrive:") and key[len("gdrive:"):] not in changed_ids]
+        for item in items:
+            if item.get('mimeType', '').startswith(GOOGLE_APPS_MIME_PREFIX):
+                print(f"Skipping native Google file (no downloadable content): {item['name']}")
+                continue
+            entries.append({"key": f"gdrive:{item['id']}", "name": item['name'],
+                            "modified_time": item.get('modifiedTime', ''),
+                            "load": lambda file_id=item['id']: drive.download(file_id)})
     except Exception as e:
         print(f"Error loading from Google Drive: {e}")
+        # Keep previously indexed Drive files rather than treating them as deleted.
+        unavailable.add("gdrive:")
+        drive_sync = None
+    return entries, unavailable, drive_sync
 
-    # --- Step 2: Process each file, enrich, and create parent/child chunks ---
-    for file_info in all_files_to_process:
-        file_name, file_bytes = file_info["name"], file_info["bytes"]
-        print(f"--> Processing: {file_name}")
-        
-        parent_content, elements_or_docs = process_document_bytes(file_bytes, file_name)
-
-        if not parent_content.strip():
+def stream_changed_files(candidates: list, previous_sources: dict, unchanged: dict, failed: dict):
+    """
+    Downloads candidate files concurrently and yields those whose content actually changed,
+    as soon as each arrives. Files with an unchanged content hash are recorded in unchanged,
+    and files that could not be read are recorded in failed.
+    """
+    for entry, file_bytes, error in stream_downloads(candidates, lambda entry: entry["load"]()):
+        if error:
+            print(f"Could not download {entry['name']}: {error}")
+            failed[entry["key"]] = entry["name"]
             continue
+        content_hash = hashlib.sha256(file_bytes).hexdigest()
+        previous = previous_sources.get(entry["key"])
+        if previous and previous["content_hash"] == content_hash:
+            unchanged[entry["key"]] = {**previous, "modified_time": entry["modified_time"]}
+            continue
+        yield {"key": entry["key"], "name": entry["name"], "modified_time": entry["modified_time"],
+               "bytes": file_bytes, "content_hash": content_hash}
 
-        enrichment_data = enrich_document_with_llm(parent_content, file_name)
-        parent_id = str(uuid.uuid4())
-        
-        parent_doc = Document(
-            page_content=parent_content,
-            metadata={
-                "source": file_name,
-                "doc_id": parent_id,
-                **enrichment_data
-            }
-        )
-        docstore.mset([(parent_id, parent_doc)])
-        
-        sub_docs = elements_or_docs if (elements_or_docs and isinstance(elements_or_docs[0], Document)) else chunk_by_structure(elements_or_docs, file_name)
-
-        for sub_doc in sub_docs:
-            sub_doc.metadata["parent_doc_id"] = parent_id
-        child_documents.extend(sub_docs)
-
-    # --- THIS IS THE CORRECTED LINE ---
-    print(f"Created {len(child_documents)} child chunks from {len(list(docstore.yield_keys()))} parent documents.")
-
-    if not child_documents:
-        print("No chunks were generated. Knowledge Base build aborted.")
-        return "Build failed: No chunks generated."
-
-    # --- Step 3: Build and Save Hybrid Indexes from CHILD documents ---
-    embeddings = OpenAIEmbeddings(model=config.OPENAI_EMBEDDING_MODEL)
-    vector_store = FAISS.from_documents(child_documents, embeddings)
-    vector_store.save_local(config.INDEX_STORE_PATH)
-    print(f"FAISS index saved to {config.INDEX_STORE_PATH}")
-    
-    with open(config.DOCSTORE_PATH, "wb") as f:
-        pickle.dump(docstore, f)
-    print(f"Parent document store saved to {config.DOCSTORE_PATH}")
-
-    tokenized_chunks = [doc.page_content.split(" ") for doc in child_documents]
-    bm25_index = BM25Okapi(tokenized_chunks)
-    with open(config.BM25_INDEX_PATH, "wb") as f:
-        pickle.dump({'index': bm25_index, 'chunks': child_documents}, f)
-    print(f"BM25 index saved to {config.BM25_INDEX_PATH}")
+def assemble_source_documents(file_info: dict, parent_content: str, elements_or_docs: list,
+                              enrichment_data: dict) -> tuple[Document, list[Document]] | None:
+    """Turns one partitioned, enriched file into a parent document and its child chunks."""
+    file_name = file_info["name"]
+    if not parent_content.strip():
+        return None
+
+    parent_id = str(uuid.uuid4())
+    parent_doc = Document(
+        page_content=parent_content,
+        metadata={
+            "source": file_name,
+            "doc_id": parent_id,
+            **enrichment_data
+        }
+    )
+    sub_docs = elements_or_docs if (elements_or_docs and isinstance(elements_or_docs[0], Document)) else chunk_by_structure(elements_or_docs, file_name)
+    for sub_doc in sub_docs:
+        sub_doc.metadata["parent_doc_id"] = parent_id
+    return parent_doc, sub_docs
+
+# --- Main Builder Function ---
+def build_and_save_knowledge_base(gdrive_folder_id: str = config.GDRIVE_FOLDER_ID, full_rebuild: bool = False):
+    """
+    Builds the KB using a Parent-Child strategy with Structure-Aware Chunking.
+    Updates are incremental: only added or changed files are processed, and removed or
+    changed files have their chunks and parents deleted from a copy of the previous indexes.
+    """
+    print("🚀 Starting Knowledge Base build ...")
+    os.makedirs(config.IMAGE_STORE_PATH, exist_ok=True)
+
+    manifest = read_manifest()
+    previous_sources = read_sources(manifest["generation"]) if (manifest and not full_rebuild) else None
+    incremental = previous_sources is not None and "next_chunk_id" in manifest
+    previous_sources = previous_sources if incremental else {}
+    next_chunk_id = manifest["next_chunk_id"] if incremental else 0
+    previous_drive_state = read_drive_state(manifest["generation"]) if incremental else None
+
+    # --- Step 1: List sources and work out which were added, touched or removed (no downloads yet) ---
+    listed, unavailable, drive_sync = list_source_files(gdrive_folder_id, previous_sources, previous_drive_state)
+    listed_keys = {entry["key"] for entry in listed}
+    unchanged, candidates, failed = {}, [], {}
+    for entry in listed:
+        previous = previous_sources.get(entry["key"])
+        if previous and previous["modified_time"] == entry["modified_time"]:
+            unchanged[entry["key"]] = previous
+        else:
+            candidates.append(entry)
+    for key, previous in previous_sources.items():
+        if key not in listed_keys and any(key.startswith(prefix) for prefix in unavailable):
+            unchanged[key] = previous
+    removed_keys = {key for key in previous_sources if key not in listed_keys and key not in unchanged}
+    print(f"Sources: {len(candidates)} new or modified, {len(unchanged)} unchanged, {len(removed_keys)} removed.")
+
+    def drive_state_to_store() -> dict | None:
+        # Failed Drive files are remembered so the next delta sync fetches them again.
+        if drive_sync is None:
+            return previous_drive_state
+        return drive_sync.finish(key[len("gdrive:"):] for key in failed if key.startswith("gdrive:"))
+
+    if incremental and not candidates and not removed_keys:
+        if drive_sync is not None:
+            write_drive_state(manifest["generation"], drive_state_to_store())
+        print("✅ Knowledge Base is already up to date.")
+        return "✅ Knowledge Base is already up to date."
+
+    # --- Step 2: Stream downloads into partitioning and enrichment, flushing chunks to on-disk segments ---
+    # Raw bytes and partitioned elements are only held for a bounded window of files, and child
+    # chunks and parents are written out every BUILD_SEGMENT_CHUNKS chunks, so memory does not grow with the corpus.
+    previous_paths = get_artifact_paths(manifest["generation"]) if incremental else None
+    generation, paths = create_generation()
+    memory = MemoryMonitor().start()
+    try:
+        writer = SegmentWriter(os.path.join(config.KB_STORE_PATH, generation, "segments"), create_openai_embeddings())
+        processed, pending, partition_timings = {}, deque(), {}
+        chunk_histogram = TokenHistogram()
+
+        def assemble(file_info: dict, partitioned: tuple, enrichment_data: dict | None):
+            print(f"--> Processing: {file_info['name']}")
+            source_entry = {"name": file_info["name"], "content_hash": file_info["content_hash"],
+                            "modified_time": file_info["modified_time"], "parent_id": None, "chunk_ids": []}
+            # Files without text are still recorded so unchanged ones are not re-partitioned next time.
+            processed[file_info["key"]] = source_entry
+            row_spool = partitioned[3] if len(partitioned) > 3 else None
+            result = assemble_source_documents(file_info, partitioned[0], partitioned[1], enrichment_data)
+            if result is None:
+                if row_spool is not None:
+                    row_spool.discard()
+                return
+            parent_doc, sub_docs = result
+
+            def number(docs: list) -> list[int]:
+                # Child chunks get integer ids, contiguous per file; the chunk store and BM25 refer to them by id.
+                nonlocal next_chunk_id
+                ids = list(range(next_chunk_id, next_chunk_id + len(docs)))
+                next_chunk_id += len(docs)
+                for chunk_id, doc in zip(ids, docs):
+                    doc.metadata["chunk_id"] = chunk_id
+                return ids
+
+            chunk_ids = number(sub_docs)
+            writer.add(parent_doc, sub_docs)
+            if row_spool is not None:
+                # A table's rows are read back from the worker's spool a chunk at a time, so they reach
+                # the segments without the whole table being held as Documents.
+                for rows in row_spool.batches():
+                    for row in rows:
+                        row.metadata["parent_doc_id"] = parent_doc.metadata["doc_id"]
+                    chunk_ids += number(rows)
+                    writer.add_children(rows)
+            for sub_doc in sub_docs:
+                if "tokens" in sub_doc.metadata:
+                    chunk_histogram.add(sub_doc.metadata["tokens"])
+            source_entry.update(parent_id=parent_doc.metadata["doc_id"], chunk_ids=chunk_ids)
+            tables = [sub_doc.metadata["table"] for sub_doc in sub_docs if "table" in sub_doc.metadata]
+            if tables:
+                # Spreadsheets stored as Parquet are exposed to the table query tool via the sources manifest.
+                source_entry["tables"] = tables
+            images = sorted({os.path.basename(sub_doc.metadata["image_path"]) for sub_doc in sub_docs
+                             if "image_path" in sub_doc.metadata})
+            if images:
+                # Recorded so prune_images() keeps every image a live generation still points to.
+                source_entry["images"] = images
+
+        def drain(max_waiting: int):
+            # Assembles files in submission order once enriched, blocking when too many are waiting.
+            while pending and (len(pending) > max_waiting or pending[0][2] is None or pending[0][2].done()):
+                file_info, partitioned, enrichment = pending.popleft()
+                assemble(file_info, partitioned, enrichment.result() if enrichment else None)
+
+        changed_files = stream_changed_files(candidates, previous_sources, unchanged, failed)
+        with EnrichmentStage() as enrichment_stage:
+            for file_info, partitioned, error in partition_files(changed_files):
+                del file_info["bytes"]
+                if error:
+                    # A failed file keeps its previous chunks (if any) and is retried on the next update.
+                    print(f"Skipping {file_info['name']}: {error}")
+                    failed[file_info["key"]] = file_info["name"]
+                    continue
+                parent_content = partitioned[0]
+                merge_timings(partition_timings, partitioned[2])
+                # Enrichment requests start as soon as a file is partitioned, overlapping with the remaining partitioning.
+                enrichment = enrichment_stage.submit(parent_content, file_info["name"]) if parent_content.strip() else None
+                pending.append((file_info, partitioned, enrichment))
+                drain(config.ENRICHMENT_CONCURRENCY * 2)
+            drain(0)
+        if partition_timings:
+            print(f"Partitioning: {format_timings(partition_timings)}")
+        if chunk_histogram.total:
+            print(f"Document chunk sizes: {chunk_histogram.format()}")
+        print(f"Enrichment: {enrichment_stage.stats['enriched']} enriched, {enrichment_stage.stats['cached']} cached, "
+              f"{enrichment_stage.stats['failed']} failed.")
+
+        # Failed files keep their previous entry; processed and removed files drop theirs.
+        sources = {**unchanged, **processed}
+        for key in failed:
+            if key in previous_sources:
+                sources[key] = previous_sources[key]
+        stale_sources = {key: previous_sources[key] for key in removed_keys | set(processed) if key in previous_sources}
+
+        if incremental and not processed and not removed_keys:
+            discard_generation(generation)
+            if sources != previous_sources:
+                # Only modification times moved; record them so the next update can skip these files cheaply.
+                write_sources(manifest["generation"], sources)
+            if drive_sync is not None:
+                write_drive_state(manifest["generation"], drive_state_to_store())
+            print("✅ Knowledge Base is already up to date.")
+            return "✅ Knowledge Base is already up to date."
+
+        removed_chunk_ids = [chunk_id for entry in stale_sources.values() for chunk_id in entry["chunk_ids"]]
+        removed_parent_ids = [entry["parent_id"] for entry in stale_sources.values() if entry["parent_id"]]
+        total_chunks = sum(len(entry["chunk_ids"]) for entry in sources.values())
+        print(f"Created {writer.chunk_count} child chunks from {writer.parent_count} parent documents; "
+              f"removing {len(removed_chunk_ids)} stale chunks.")
+
+        if not total_chunks:
+            discard_generation(generation)
+            print("No chunks were generated. Knowledge Base build aborted.")
+            return "Build failed: No chunks generated."
+
+        # --- Step 3: Merge the segments with a copy of the previous indexes into the new generation ---
+        writer.merge(paths, previous_paths, removed_chunk_ids, removed_parent_ids)
+        embedding_stats = writer.embedding_stats
+        print(f"Embeddings: {embedding_stats['reused']} reused, {embedding_stats['computed']} computed.")
+        write_sources(generation, sources)
+        drive_state = drive_state_to_store()
+        if drive_state is not None:
+            write_drive_state(generation, drive_state)
+    except Exception:
+        discard_generation(generation)
+        raise
+    finally:
+        memory.stop()
+
+    # --- Step 4: Atomically publish the generation so readers hot-swap to it ---
+    publish_generation(generation, child_chunks=total_chunks, embeddings=embedding_stats,
+                       next_chunk_id=next_chunk_id, segments=len(writer.segments), memory=memory.summary(),
+                       partition_timings=partition_timings, chunk_tokens=chunk_histogram.to_dict())
+    print(f"Published knowledge base generation {generation} ({memory.format()})")
+    prune_tables()
+    prune_images()
     
     print("✅ Knowledge Base built successfully.")
-    return "✅ Knowledge Base built successfully."
+    return (f"✅ Knowledge Base {'updated' if incremental else 'built'} successfully. "
+            f"{len(processed)} file(s) processed, {len(removed_keys)} removed, "
+            f"{len(failed)} failed{' (' + ', '.join(failed.values()) + ')' if failed else ''}, "
+            f"{total_chunks} chunks indexed in {len(writer.segments)} segment(s) ({embedding_stats['reused']} embeddings reused, "
+            f"{embedding_stats['computed']} computed), {memory.format()}.")
 
 if __name__ == '__main__':
-    build_and_save_knowledge_base()
\ No newline at end of file
+    build_and_save_knowledge_base()
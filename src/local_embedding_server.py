@@ -0,0 +1,65 @@
+# local_embedding_server.py
+"""
+Minimal OpenAI-compatible embeddings server for local builds and tests without API access.
+Vectors are deterministic hashed bags of words, so identical texts always get identical
+vectors and texts sharing words land close together.
+
+Usage:
+    python local_embedding_server.py --port 8765 --dim 1536
+    then set EMBEDDING_API_BASE = "http://localhost:8765/v1" in config.py
+"""
+import re
+import json
+import base64
+import hashlib
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+def embed_text(text: str, dim: int) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(token.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def make_handler(dim: int):
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/embeddings"):
+                self.send_error(404)
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            inputs = request["input"]
+            inputs = [inputs] if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)) else inputs
+            data = []
+            for i, item in enumerate(inputs):
+                # Clients that pre-tokenise send lists of token ids; hash those like words.
+                text = item if isinstance(item, str) else " ".join(f"t{token}" for token in item)
+                vector = embed_text(text, dim)
+                embedding = (base64.b64encode(vector.tobytes()).decode("ascii")
+                             if request.get("encoding_format") == "base64" else vector.tolist())
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            tokens = sum(len(str(item).split()) for item in inputs)
+            body = json.dumps({"object": "list", "data": data, "model": request.get("model", "local"),
+                               "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+    return EmbeddingHandler
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI embeddings API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+    print(f"Serving stand-in embeddings on http://{args.host}:{args.port}/v1 (dim={args.dim})")
+    ThreadingHTTPServer((args.host, args.port), make_handler(args.dim)).serve_forever()
@@ -11,7 +11,8 @@ from langchain_openai import ChatOpenAI
 import config
 from knowledge_kb import build_and_save_knowledge_base
 from knowledge_base_tools import knowledge_base_search_tool, source_formatter_tool
-from analysis_tools import python_code_executor_tool
+from analysis_tools import python_code_executor_tool, table_catalog_tool, table_query_tool
+from image_store import get_thumbnail
 
 from google_tools import (
     google_drive_search_tool,
@@ -230,7 +231,8 @@ if st.button("🚀 Get Answer"):
     if user_query:
         with st.spinner("Analyzing..."):
             def encode_image_to_base64(image_path):
-                with open(image_path, "rb") as image_file:
+                # Ship the cached thumbnail rather than the full-resolution image
+                with open(get_thumbnail(image_path), "rb") as image_file:
                     return base64.b64encode(image_file.read()).decode('utf-8')
             #st.info("Step 1: Retrieving context from knowledge base...")
             retrieved_context = knowledge_base_search_tool.run(query=user_query)
@@ -263,17 +265,19 @@ if st.button("🚀 Get Answer"):
                                                    - Present findings clearly with proper source attribution
                                                    - Only claim information is unavailable if truly absent from context
                                                    
+                                                   For totals, filters or other numbers from spreadsheets, query the tables with the Table Query Tool instead of counting rows in the context.
+
                                                    You are thorough but accurate, ensuring no relevant information is missed while maintaining strict source-based accuracy.""",
-                                        tools=[source_formatter_tool], llm=llm, verbose=True)
+                                        tools=[source_formatter_tool, table_catalog_tool, table_query_tool], llm=llm, verbose=True)
                 data_analyst_agent = Agent(role='Data Analyst',
                                         goal="Analyze the user's request and provided text to identify data and specifications for a chart.",
-                                        backstory="You are an expert at understanding data requirements from natural language.",
-                                        llm=llm, verbose=True)
+                                        backstory="You are an expert at understanding data requirements from natural language. When the data lives in knowledge base spreadsheets, you pull exact figures with the Table Query Tool.",
+                                        tools=[table_catalog_tool, table_query_tool], llm=llm, verbose=True)
                 data_preparation_agent = Agent(role='Data Preparation Specialist',
                                             goal="Take raw text and the analyst's plan, then extract and format it into a perfect CSV string.",
                                             backstory="""You Organize your data into the right format for creating charts.
                                             "You are a meticulous data cleaner who helps organize data properly for visualization.""",
-                                            llm=llm, verbose=True)
+                                            tools=[table_query_tool], llm=llm, verbose=True)
             
             # --- Dynamic Chart Generation Setup ---
                 code_generation_agent = Agent(
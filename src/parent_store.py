@@ -0,0 +1,93 @@
+# parent_store.py
+import os
+import json
+import pickle
+import sqlite3
+import threading
+from langchain_community.docstore.document import Document
+
+# --- Disk-Backed Document Stores (SQLite) ---
+class ParentStore:
+    """
+    Parent documents keyed by doc_id in a SQLite file, a drop-in for the InMemoryStore the
+    builder used to pickle: mget/mset/mdelete behave the same, but a lookup reads only the
+    requested rows instead of unpickling every parent. Published generations are opened
+    read-only, so any number of processes can read one concurrently.
+    """
+
+    TABLE = "parents"
+    KEY, KEY_TYPE = "doc_id", "TEXT"
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        if read_only:
+            # A published generation is never written again, so readers can skip locking altogether.
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+                                   f"{self.KEY} {self.KEY_TYPE} PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL)")
+        self._lock = threading.Lock()
+
+    def mget(self, keys: list) -> list:
+        """Returns the Documents for keys in order, with None for keys that are not stored."""
+        found = {}
+        unique_keys = [key for key in dict.fromkeys(keys) if key is not None]
+        # Stay well under SQLite's bound-parameter limit.
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {self.KEY}, page_content, metadata FROM {self.TABLE} WHERE {self.KEY} IN ({placeholders})",
+                    batch
+                ).fetchall()
+            found.update((key, Document(page_content=content, metadata=json.loads(metadata)))
+                         for key, content, metadata in rows)
+        return [found.get(key) for key in keys]
+
+    def mset(self, items):
+        """Stores (key, Document) pairs; items may be any iterable, so large batches can be streamed in."""
+        rows = ((key, doc.page_content, json.dumps(doc.metadata, default=str)) for key, doc in items)
+        with self._lock, self._conn:
+            self._conn.executemany(f"INSERT OR REPLACE INTO {self.TABLE} VALUES (?, ?, ?)", rows)
+
+    def mdelete(self, keys: list):
+        with self._lock, self._conn:
+            self._conn.executemany(f"DELETE FROM {self.TABLE} WHERE {self.KEY} = ?", [(key,) for key in keys])
+
+    def yield_keys(self):
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(f"SELECT {self.KEY} FROM {self.TABLE}")]
+        yield from keys
+
+    def copy_to(self, path: str):
+        """Copies the store with SQLite's online backup and opens the copy for writing."""
+        with self._lock, sqlite3.connect(path) as target:
+            self._conn.backup(target)
+        target.close()
+        return type(self)(path)
+
+    def close(self):
+        self._conn.close()
+
+class ChunkStore(ParentStore):
+    """
+    Child chunks keyed by their integer chunk_id, stored the same way as parents so that
+    neither the build nor the retrieval engine holds the corpus text in memory; the FAISS
+    index only keeps the vectors and the position -> chunk id map.
+    """
+
+    TABLE = "chunks"
+    KEY, KEY_TYPE = "chunk_id", "INTEGER"
+
+def open_parent_store(paths: dict):
+    """
+    Opens the parent store of a generation for reading. Generations built before the SQLite
+    store (and the legacy flat layout) only have a pickled InMemoryStore, which is loaded instead.
+    """
+    if paths.get("parent_store") and os.path.exists(paths["parent_store"]):
+        return ParentStore(paths["parent_store"], read_only=True)
+    with open(paths["docstore"], "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,172 @@
+# partition_planner.py
+import io
+import time
+import config
+from unstructured.partition.auto import partition
+
+# Heavier strategies win when short page runs are merged into their neighbours.
+STRATEGY_RANK = {"fast": 0, "ocr_only": 1, "hi_res": 2}
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "tif", "tiff", "bmp", "heic"}
+
+# --- Page Inspection ---
+def inspect_pdf_pages(file_bytes: bytes) -> list[dict]:
+    """Cheap per-page signals from the PDF itself: text layer size, image coverage and vector drawings."""
+    import pymupdf as fitz
+    pages = []
+    with fitz.open(stream=file_bytes, filetype="pdf") as pdf:
+        for page in pdf:
+            page_area = abs(page.rect) or 1.0
+            image_area = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+            pages.append({"text_chars": len(page.get_text("text").strip()),
+                          "image_coverage": min(image_area / page_area, 1.0),
+                          "drawings": len(page.get_drawings())})
+    return pages
+
+def choose_page_strategy(page: dict) -> str:
+    """fast for born-digital text pages, OCR for scans, hi_res layout detection for figure/table-heavy pages."""
+    if page["text_chars"] < config.PARTITION_MIN_TEXT_CHARS:
+        # No usable text layer: a scanned page needs OCR, an (almost) empty one does not.
+        return config.PARTITION_SCANNED_STRATEGY if page["image_coverage"] > 0.5 else "fast"
+    if page["image_coverage"] > config.PARTITION_HI_RES_IMAGE_COVERAGE or page["drawings"] > config.PARTITION_HI_RES_DRAWINGS:
+        return "hi_res"
+    return "fast"
+
+def group_page_runs(strategies: list[str]) -> list[tuple[int, int, str]]:
+    """
+    Groups consecutive pages with the same strategy into (start, end, strategy) runs (end
+    exclusive). Runs shorter than PARTITION_MIN_RUN_PAGES are folded into the heavier
+    neighbour, so a document isn't split into many tiny partition calls.
+    """
+    runs = []
+    for index, strategy in enumerate(strategies):
+        if runs and runs[-1][2] == strategy:
+            runs[-1][1] = index + 1
+        else:
+            runs.append([index, index + 1, strategy])
+    changed = True
+    while changed and len(runs) > 1:
+        changed = False
+        for i, (start, end, strategy) in enumerate(runs):
+            if end - start >= config.PARTITION_MIN_RUN_PAGES:
+                continue
+            neighbours = [runs[j] for j in (i - 1, i + 1) if 0 <= j < len(runs)]
+            target = max(neighbours, key=lambda run: STRATEGY_RANK[run[2]])
+            if STRATEGY_RANK[target[2]] >= STRATEGY_RANK[strategy]:
+                runs[i][2] = target[2]
+                changed = True
+        merged = []
+        for run in runs:
+            if merged and merged[-1][2] == run[2]:
+                merged[-1][1] = run[1]
+            else:
+                merged.append(run)
+        runs = merged
+    return [tuple(run) for run in runs]
+
+def plan_partition(file_bytes: bytes, file_name: str) -> list[tuple[int | None, int | None, str]]:
+    """
+    Returns the partition plan for a document as (start page, end page, strategy) runs. Documents
+    that are not inspectable PDFs get a single run without page bounds. PARTITION_STRATEGY forces
+    one strategy for every document unless it is "auto".
+    """
+    if config.PARTITION_STRATEGY != "auto":
+        return [(None, None, config.PARTITION_STRATEGY)]
+    file_ext = file_name.lower().split('.')[-1]
+    if file_ext in IMAGE_EXTENSIONS:
+        return [(None, None, config.PARTITION_SCANNED_STRATEGY)]
+    if file_ext != "pdf":
+        # DOCX, PPTX, HTML, TXT, ... are parsed structurally; layout models add nothing but time.
+        return [(None, None, "fast")]
+    try:
+        pages = inspect_pdf_pages(file_bytes)
+    except Exception as e:
+        print(f"Could not inspect {file_name} ({e}); using hi_res.")
+        return [(None, None, "hi_res")]
+    if not pages:
+        return [(None, None, "fast")]
+    return group_page_runs([choose_page_strategy(page) for page in pages])
+
+def extract_pdf_pages(file_bytes: bytes, start: int, end: int) -> bytes:
+    """Returns a new PDF holding pages [start, end) of the given one."""
+    import pymupdf as fitz
+    with fitz.open(stream=file_bytes, filetype="pdf") as pdf, fitz.open() as part:
+        part.insert_pdf(pdf, from_page=start, to_page=end - 1)
+        return part.tobytes()
+
+def count_pdf_pages(file_bytes: bytes) -> int:
+    import pymupdf as fitz
+    with fitz.open(stream=file_bytes, filetype="pdf") as pdf:
+        return pdf.page_count
+
+def partition_page_range(run_bytes: bytes, file_name: str, start: int, strategy: str) -> list:
+    """Partitions pages extracted with extract_pdf_pages, numbering them as in the original document."""
+    elements = partition(file=io.BytesIO(run_bytes), file_filename=file_name, strategy=strategy)
+    for element in elements:
+        # Page numbers restart in each extracted run; shift them back to the original document.
+        element.metadata.page_number = (element.metadata.page_number or 1) + start
+    return elements
+
+# --- Planned Partitioning ---
+def partition_with_plan(file_bytes: bytes, file_name: str) -> tuple[list, dict]:
+    """
+    Partitions a document run by run according to its plan. Returns (elements in page order,
+    timings) where timings maps each strategy used to {"files", "pages", "seconds"} plus the
+    time spent planning under "planning".
+    """
+    started = time.perf_counter()
+    plan = plan_partition(file_bytes, file_name)
+    timings = {"planning": {"files": 1, "pages": 0, "seconds": time.perf_counter() - started}}
+    elements = []
+    for start, end, strategy in plan:
+        run_started = time.perf_counter()
+        if len(plan) == 1:
+            run_elements = partition(file=io.BytesIO(file_bytes), file_filename=file_name, strategy=strategy)
+        else:
+            run_elements = partition_page_range(extract_pdf_pages(file_bytes, start, end), file_name, start, strategy)
+        elements.extend(run_elements)
+        stats = timings.setdefault(strategy, {"files": 1, "pages": 0, "seconds": 0.0})
+        stats["pages"] += (end - start) if start is not None else 0
+        stats["seconds"] += time.perf_counter() - run_started
+    if len(plan) > 1:
+        print(f"Partitioned {file_name} in {len(plan)} runs: " +
+              ", ".join(f"pages {start + 1}-{end} {strategy}" for start, end, strategy in plan))
+    return elements, timings
+
+# --- Page-Range Tasks ---
+def plan_page_tasks(file_bytes: bytes, file_name: str, pages_per_task: int | None = None) -> list[tuple[int, int, str]] | None:
+    """
+    Splits a large PDF into (start, end, strategy) page ranges of at most pages_per_task pages,
+    each keeping the strategy its pages were planned with, so the ranges can be partitioned on
+    separate workers. Returns None for documents that are partitioned whole: anything that is
+    not a readable PDF longer than one task.
+    """
+    pages_per_task = config.PARTITION_PAGES_PER_TASK if pages_per_task is None else pages_per_task
+    if not pages_per_task or file_name.lower().split('.')[-1] != "pdf":
+        return None
+    try:
+        page_count = count_pdf_pages(file_bytes)
+    except Exception:
+        return None
+    if page_count <= pages_per_task:
+        return None
+    tasks = []
+    for start, end, strategy in plan_partition(file_bytes, file_name):
+        if start is None:
+            start, end = 0, page_count
+        # Split each run into equal pieces rather than full tasks plus a short remainder.
+        pieces = -(-(end - start) // pages_per_task)
+        step = -(-(end - start) // pieces)
+        tasks.extend((piece, min(piece + step, end), strategy) for piece in range(start, end, step))
+    return tasks
+
+def merge_timings(total: dict, timings: dict):
+    """Adds one file's partition timings into the build totals."""
+    for strategy, stats in timings.items():
+        bucket = total.setdefault(strategy, {"files": 0, "pages": 0, "seconds": 0.0})
+        for key in bucket:
+            bucket[key] += stats.get(key, 0)
+
+def format_timings(total: dict) -> str:
+    return ", ".join(f"{strategy} {stats['seconds']:.1f}s over {stats['files']} file(s)"
+                     + (f"/{stats['pages']} page(s)" if stats["pages"] else "")
+                     for strategy, stats in sorted(total.items(), key=lambda item: -item[1]["seconds"]))
@@ -0,0 +1,118 @@
+# rerankers.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import config
+from caches import LRUCache, normalize_query, format_cache_stats
+
+# --- Reranker Interface ---
+class Reranker:
+    """Re-orders candidate passages for a query. Subclasses implement _rank()."""
+
+    def __init__(self, max_candidates: int | None = None):
+        self.max_candidates = max_candidates or config.RERANK_MAX_CANDIDATES
+
+    def rerank(self, query: str, documents: list[str], top_n: int) -> list[int]:
+        """Returns the indices of the top_n best documents, best first."""
+        # Candidates arrive in fused-rank order, so the budget keeps the most promising ones.
+        documents = documents[:self.max_candidates]
+        if not documents:
+            return []
+        return self._rank(query, documents, min(top_n, len(documents)))
+
+    def _rank(self, query: str, documents: list[str], top_n: int) -> list[int]:
+        raise NotImplementedError
+
+class CohereReranker(Reranker):
+    """Hosted reranking through the Cohere rerank API (one network round-trip per query)."""
+
+    def __init__(self, model: str | None = None, max_candidates: int | None = None):
+        super().__init__(max_candidates)
+        import cohere
+        api_key = os.getenv("COHERE_API_KEY")
+        if not api_key:
+            raise ValueError("COHERE_API_KEY not found in .env file.")
+        self.client = cohere.Client(api_key)
+        self.model = model or config.COHERE_RERANK_MODEL
+
+    def _rank(self, query: str, documents: list[str], top_n: int) -> list[int]:
+        response = self.client.rerank(model=self.model, query=query, documents=documents, top_n=top_n)
+        return [hit.index for hit in response.results]
+
+class CrossEncoderReranker(Reranker):
+    """Local CPU cross-encoder; runs fully offline once the model is in the Hugging Face cache."""
+
+    def __init__(self, model_name: str | None = None, batch_size: int | None = None,
+                 max_workers: int | None = None, max_candidates: int | None = None):
+        super().__init__(max_candidates)
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name or config.CROSS_ENCODER_MODEL, device="cpu")
+        self.batch_size = batch_size or config.RERANK_BATCH_SIZE
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or config.RERANK_WORKERS,
+                                           thread_name_prefix="rerank")
+
+    def _score_batch(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        return np.asarray(self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False), dtype=np.float32)
+
+    def _rank(self, query: str, documents: list[str], top_n: int) -> list[int]:
+        pairs = [(query, doc) for doc in documents]
+        batches = [pairs[i:i + self.batch_size] for i in range(0, len(pairs), self.batch_size)]
+        scores = np.concatenate(list(self.executor.map(self._score_batch, batches)))
+        # Sort by score, breaking ties by original (fused) rank.
+        order = np.lexsort((np.arange(len(scores)), -scores))
+        return [int(i) for i in order[:top_n]]
+
+_RERANKER_BACKENDS = {
+    "cohere": CohereReranker,
+    "cross-encoder": CrossEncoderReranker,
+}
+
+_reranker: Reranker | None = None
+_reranker_lock = threading.Lock()
+
+def get_reranker() -> Reranker:
+    """Returns the process-wide reranker for config.RERANKER_BACKEND, created on first use."""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                backend = _RERANKER_BACKENDS.get(config.RERANKER_BACKEND)
+                if backend is None:
+                    raise ValueError(f"Unknown RERANKER_BACKEND '{config.RERANKER_BACKEND}'. "
+                                     f"Choose one of: {', '.join(_RERANKER_BACKENDS)}")
+                _reranker = backend()
+    return _reranker
+
+# --- Rerank Result Cache ---
+_rerank_cache = LRUCache(config.RERANK_CACHE_SIZE, ttl_seconds=config.RERANK_CACHE_TTL_SECONDS)
+_rerank_cache_generation = None
+
+def rerank_candidates(generation: str | None, query: str, candidate_ids: list[int],
+                      documents: list[str], top_n: int) -> list[int]:
+    """
+    Reranks candidate chunks and returns the chosen chunk ids, best first. Results are cached
+    on (normalised query, candidates actually reranked) and dropped whenever the KB generation changes.
+    """
+    global _rerank_cache_generation
+    if generation != _rerank_cache_generation:
+        _rerank_cache.clear()
+        _rerank_cache_generation = generation
+    reranker = get_reranker()
+    # The reranker keeps the first max_candidates in fused order, and ties keep that order, so the
+    # key is the truncated ids as ranked: the same set in another order can rerank differently.
+    key = (generation, normalize_query(query), tuple(candidate_ids[:reranker.max_candidates]), top_n)
+    cached = _rerank_cache.get(key)
+    if cached is not None:
+        return cached
+    reranked_indices = reranker.rerank(query, documents, top_n=top_n)
+    top_chunk_ids = [candidate_ids[i] for i in reranked_indices]
+    _rerank_cache.put(key, top_chunk_ids)
+    return top_chunk_ids
+
+def get_rerank_cache_stats() -> dict:
+    """Hit/miss counters of the process-wide rerank cache."""
+    return _rerank_cache.stats()
+
+def format_rerank_cache_stats() -> str:
+    return f"Rerank cache: {format_cache_stats(get_rerank_cache_stats())}"
@@ -0,0 +1,127 @@
+# retrieval_engine.py
+import os
+import pickle
+import threading
+import numpy as np
+from langchain_community.vectorstores import FAISS
+import config
+from kb_store import get_current_generation
+from bm25_index import SparseBM25Index
+from parent_store import ChunkStore, open_parent_store
+from vector_index import load_ann_index
+from embedding_cache import get_cached_query_embeddings, create_openai_embeddings
+
+# --- Warm Retrieval Engine ---
+class RetrievalEngine:
+    """Holds the FAISS index and BM25 index of one KB generation in memory, plus its on-disk chunk and parent stores."""
+
+    def __init__(self, generation: str | None, paths: dict):
+        self.generation = generation
+        self.paths = paths
+        embeddings = get_cached_query_embeddings(create_openai_embeddings(), config.OPENAI_EMBEDDING_MODEL)
+        if paths.get("ann_index") and os.path.exists(paths["ann_index"]):
+            # Search the ANN index; the flat index's vectors are never loaded.
+            with open(os.path.join(paths["index"], "index.pkl"), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            self.vector_store = FAISS(embeddings, load_ann_index(paths["ann_index"]), docstore, index_to_docstore_id)
+        else:
+            self.vector_store = FAISS.load_local(paths["index"], embeddings, allow_dangerous_deserialization=True)
+        self._legacy_chunks = None
+        if generation is None:
+            # Older builds pickled a rank_bm25 object plus a copy of every chunk; re-index those once at load.
+            with open(paths["bm25"], "rb") as f:
+                self._legacy_chunks = pickle.load(f)["chunks"]
+            self.bm25_index = SparseBM25Index.from_tokenized([doc.page_content.split(" ") for doc in self._legacy_chunks])
+        else:
+            self.bm25_index = SparseBM25Index.load(paths["bm25"])
+        # Chunks and parents are looked up on disk per query rather than loaded up front.
+        self.chunk_store = None
+        if paths.get("chunk_store") and os.path.exists(paths["chunk_store"]):
+            self.chunk_store = ChunkStore(paths["chunk_store"], read_only=True)
+        self.docstore = open_parent_store(paths)
+        print(f"Retrieval engine loaded generation: {generation or 'legacy'}")
+
+    def get_chunks(self, chunk_ids) -> list:
+        """Resolves child chunk ids to their Documents (None if unknown)."""
+        if self._legacy_chunks is not None:
+            return [self._legacy_chunks[int(chunk_id)] if 0 <= int(chunk_id) < len(self._legacy_chunks) else None
+                    for chunk_id in chunk_ids]
+        if self.chunk_store is not None:
+            return self.chunk_store.mget([int(chunk_id) for chunk_id in chunk_ids])
+        # Generations built before the chunk store keep chunk text in the FAISS docstore.
+        docs = [self.vector_store.docstore.search(str(chunk_id)) for chunk_id in chunk_ids]
+        # The FAISS docstore answers unknown ids with an error string rather than raising.
+        return [doc if not isinstance(doc, str) else None for doc in docs]
+
+    def vector_search(self, query: str, k: int) -> list[int]:
+        """Nearest child chunk ids for the query, best first, read straight off the FAISS index."""
+        embedding = np.array([self.vector_store.embedding_function.embed_query(query)], dtype=np.float32)
+        _, positions = self.vector_store.index.search(embedding, k)
+        positions = [int(pos) for pos in positions[0] if pos != -1]
+        if self._legacy_chunks is not None:
+            # Legacy FAISS stores were built from the pickled chunk list in order, so positions are chunk ids.
+            return positions
+        return [int(self.vector_store.index_to_docstore_id[pos]) for pos in positions]
+
+    def keyword_search(self, query: str, k: int) -> list[int]:
+        """Top BM25 child chunk ids for the query, best first."""
+        tokenized_query = query.lower().split(" ")
+        top_chunk_ids, _ = self.bm25_index.top_k(tokenized_query, k)
+        return [int(chunk_id) for chunk_id in top_chunk_ids]
+
+    def hybrid_search(self, query: str) -> list[int]:
+        """Fuses the vector and keyword rankings into one deterministic list of candidate chunk ids."""
+        rankings = {
+            "vector": self.vector_search(query, config.HYBRID_TOP_K),
+            "keyword": self.keyword_search(query, config.HYBRID_TOP_K),
+        }
+        return reciprocal_rank_fusion(rankings, weights=config.FUSION_WEIGHTS, limit=config.FUSED_CANDIDATES)
+
+# --- Score Fusion ---
+def reciprocal_rank_fusion(rankings: dict, weights: dict | None = None, k: int | None = None,
+                           limit: int | None = None) -> list[int]:
+    """
+    Weighted reciprocal-rank fusion over ranked lists of integer chunk ids.
+    Each list contributes weight / (k + rank); ties are broken by the lower chunk id.
+    """
+    k = config.RRF_K if k is None else k
+    fused_scores = {}
+    for name, ranked_ids in rankings.items():
+        weight = (weights or {}).get(name, 1.0)
+        for rank, chunk_id in enumerate(ranked_ids, start=1):
+            fused_scores[chunk_id] = fused_scores.get(chunk_id, 0.0) + weight / (k + rank)
+    fused = sorted(fused_scores.items(), key=lambda item: (-item[1], item[0]))
+    return [chunk_id for chunk_id, _ in fused[:limit]]
+
+# One engine per process, shared by every Streamlit session and agent tool call.
+_engine: RetrievalEngine | None = None
+_engine_key = None
+_engine_lock = threading.Lock()
+
+def _generation_key(generation: str | None, paths: dict):
+    if generation is not None:
+        return generation
+    # Legacy flat files have no manifest, so fall back to their modification times.
+    return tuple(os.path.getmtime(p) for p in paths.values())
+
+def get_retrieval_engine() -> RetrievalEngine | None:
+    """
+    Returns the process-wide retrieval engine, loading it on first use and hot-swapping
+    it when a new KB generation is published. Returns None if no KB has been built.
+    """
+    global _engine, _engine_key
+    current = get_current_generation()
+    if current is None:
+        return None
+    generation, paths = current
+    key = _generation_key(generation, paths)
+    engine = _engine
+    if engine is not None and _engine_key == key:
+        return engine
+    with _engine_lock:
+        if _engine is None or _engine_key != key:
+            # The new engine is fully loaded before the reference is swapped, so
+            # concurrent readers keep using the previous generation until then.
+            new_engine = RetrievalEngine(generation, paths)
+            _engine, _engine_key = new_engine, key
+        return _engine
@@ -0,0 +1,199 @@
+# table_profiler.py
+import math
+import numpy as np
+import pandas as pd
+import config
+from embedding_pipeline import get_token_counter
+
+# --- Streaming Sketches ---
+class HyperLogLog:
+    """Approximate distinct counter over 64-bit hashes (2**p registers, ~1.04/sqrt(2**p) relative error)."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes << np.uint64(self.p)
+        # Rank = position of the first set bit in the remaining 64 - p bits (frexp gives the bit length).
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = np.where(rest == 0, 64 - self.p + 1, 64 - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting is more accurate for small cardinalities
+        return int(round(estimate))
+
+class ColumnProfile:
+    """Single-pass summary of one column: counts, moments, distinct sketch and heavy hitters."""
+
+    def __init__(self, name, numeric: bool, top_k_capacity: int):
+        self.name, self.numeric = name, numeric
+        self.dtype = None
+        self.count = self.missing = 0
+        self.numeric_count, self.mean, self.m2 = 0, 0.0, 0.0
+        self.min = self.max = None
+        self.distinct = HyperLogLog()
+        self.top_k_capacity = top_k_capacity
+        self.top_values = {}
+
+    def update(self, series: pd.Series):
+        present = series.dropna()
+        self.missing += len(series) - len(present)
+        self.count += len(present)
+        if present.empty:
+            # An all-missing chunk is read as float64 whatever the column holds, so it sets no type.
+            return
+        self.dtype = self.dtype or str(series.dtype)
+        if self.numeric and not _is_numeric(series) and pd.to_numeric(present, errors="coerce").isna().any():
+            # Text in a column typed numeric by earlier chunks: widen it to text, as the Parquet writer does,
+            # and collect top values from here on.
+            self.numeric, self.dtype = False, "object"
+            self.min = self.max = None
+        self.distinct.update(pd.util.hash_pandas_object(present, index=False).to_numpy())
+        if self.numeric:
+            values = pd.to_numeric(present, errors="coerce").dropna().to_numpy(dtype=np.float64)
+            if len(values):
+                # Chan et al. parallel update of the running mean and sum of squared deviations.
+                n, mean = len(values), float(values.mean())
+                m2 = float(np.square(values - mean).sum())
+                total = self.numeric_count + n
+                delta = mean - self.mean
+                self.mean += delta * n / total
+                self.m2 += m2 + delta * delta * self.numeric_count * n / total
+                self.numeric_count = total
+                self.min = float(values.min()) if self.min is None else min(self.min, float(values.min()))
+                self.max = float(values.max()) if self.max is None else max(self.max, float(values.max()))
+            return
+        if pd.api.types.is_datetime64_any_dtype(present):
+            chunk_min, chunk_max = present.min(), present.max()
+            self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+            self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+            return
+        # Heavy hitters: merge this chunk's most frequent values and keep a bounded candidate set.
+        for value, freq in present.astype(str).value_counts().head(self.top_k_capacity).items():
+            self.top_values[value] = self.top_values.get(value, 0) + int(freq)
+        if len(self.top_values) > self.top_k_capacity:
+            kept = sorted(self.top_values.items(), key=lambda item: -item[1])[:self.top_k_capacity]
+            self.top_values = dict(kept)
+
+    def describe(self, quantiles: dict | None, top_k: int) -> str:
+        parts = [f"{self.count} values", f"{self.missing} missing", f"~{min(self.distinct.count(), self.count)} distinct"]
+        if self.numeric and self.numeric_count:
+            mean = self.mean
+            std = math.sqrt(self.m2 / (self.numeric_count - 1)) if self.numeric_count > 1 else 0.0
+            stats = [f"min {_fmt(self.min)}"]
+            if quantiles:
+                stats += [f"{label} ~{_fmt(value)}" for label, value in quantiles.items()]
+            stats += [f"max {_fmt(self.max)}", f"mean {_fmt(mean)}", f"std {_fmt(std)}"]
+            parts.append(", ".join(stats))
+        elif self.min is not None:
+            parts.append(f"from {self.min} to {self.max}")
+        elif self.top_values:
+            top = sorted(self.top_values.items(), key=lambda item: -item[1])[:top_k]
+            parts.append("top: " + ", ".join(f"{_truncate(value)} ({freq})" for value, freq in top))
+        return f"- {self.name} ({self.dtype}): " + "; ".join(parts)
+
+def _is_numeric(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+def _fmt(value: float) -> str:
+    return f"{value:.6g}"
+
+def _truncate(value: str, limit: int = 40) -> str:
+    return value if len(value) <= limit else value[:limit - 1] + "…"
+
+def _fit_names(names: list[str], count_tokens, max_tokens: int) -> str:
+    """Comma-separated names, cut off with "... and K more" once they would exceed max_tokens."""
+    used = 0
+    for i, name in enumerate(names):
+        used += count_tokens(name) + 1
+        if used > max_tokens:
+            return ", ".join(names[:i]) + f", ... and {len(names) - i} more"
+    return ", ".join(names)
+
+# --- Table Profiler ---
+_SAMPLE_COLUMNS = 12
+
+class TableProfiler:
+    """
+    Profiles a table chunk by chunk during ingestion with bounded memory: exact counts, min/max,
+    mean and std, HyperLogLog distinct counts, approximate top values, and quantiles from a
+    uniform row sample (bottom-k on random keys). Replaces describe(include='all') on the
+    full DataFrame, and render() keeps the overview within a token budget.
+    """
+
+    def __init__(self, sample_size: int | None = None, top_k: int | None = None, seed: int = 0):
+        self.sample_size = sample_size or config.TABLE_PROFILE_SAMPLE_ROWS
+        self.top_k = top_k or config.TABLE_PROFILE_TOP_K
+        self.rows = 0
+        self.columns: dict = {}
+        self.head = None
+        self._sample, self._sample_keys = None, np.empty(0)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, df: pd.DataFrame):
+        if self.head is None:
+            self.head = df.head(3)
+        self.rows += len(df)
+        for col in df.columns:
+            if col not in self.columns:
+                self.columns[col] = ColumnProfile(col, _is_numeric(df[col]), self.top_k * 10)
+            self.columns[col].update(df[col])
+        # Keep the rows with the smallest random keys seen so far: a uniform sample of every chunk.
+        keys = self._rng.random(len(df))
+        sample = df if self._sample is None else pd.concat([self._sample, df], ignore_index=True)
+        keys = np.concatenate([self._sample_keys, keys])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size - 1)[:self.sample_size]
+            sample, keys = sample.iloc[keep].reset_index(drop=True), keys[keep]
+        else:
+            sample = sample.reset_index(drop=True)
+        self._sample, self._sample_keys = sample, keys
+
+    def quantiles(self, col) -> dict | None:
+        if self._sample is None or col not in self._sample:
+            return None
+        values = pd.to_numeric(self._sample[col], errors="coerce").dropna()
+        if values.empty:
+            return None
+        return {"p25": values.quantile(0.25), "median": values.quantile(0.5), "p75": values.quantile(0.75)}
+
+    def render(self, file_name: str, table: dict | None = None, max_tokens: int | None = None) -> str:
+        """Builds the overview text, adding column summaries until the token budget is reached."""
+        max_tokens = max_tokens or config.TABLE_OVERVIEW_MAX_TOKENS
+        count_tokens = get_token_counter(config.OPENAI_EMBEDDING_MODEL)
+        query_hint = (f"Queryable Table: `{table['name']}` (use the Table Query Tool for totals, filters and aggregates)\n\n"
+                      if table else "")
+        # Very wide tables list only as many column names as fit in a third of the budget.
+        column_list = _fit_names([str(col) for col in self.columns], count_tokens, max_tokens // 3)
+        header = (f"Table Overview: {file_name}\n\n{query_hint}"
+                  f"Structure: {self.rows} rows, {len(self.columns)} columns: {column_list}\n\n")
+        # Only the leading columns are shown in the sample; every column still gets a summary line.
+        head = self.head.iloc[:, :_SAMPLE_COLUMNS] if self.head is not None else None
+        sample = f"Sample Data:\n{head.to_string(index=False)}\n\n" if head is not None else ""
+        if count_tokens(header + sample) > max_tokens:
+            sample = ""
+        text = header + sample + "Column Summary:\n"
+        used = count_tokens(text)
+        lines = []
+        # Room is kept for the closing "omitted" note, so the whole text stays within max_tokens.
+        omitted_tokens = count_tokens(f"... {len(self.columns)} more column(s) omitted to stay within the overview budget.") + 1
+        for i, (col, profile) in enumerate(self.columns.items()):
+            line = profile.describe(self.quantiles(col) if profile.numeric else None, self.top_k)
+            line_tokens = count_tokens(line) + 1
+            reserve = omitted_tokens if i < len(self.columns) - 1 else 0
+            if used + line_tokens + reserve > max_tokens:
+                lines.append(f"... {len(self.columns) - i} more column(s) omitted to stay within the overview budget.")
+                break
+            lines.append(line)
+            used += line_tokens
+        return text + "\n".join(lines)
@@ -0,0 +1,165 @@
+# table_store.py
+import os
+import re
+import uuid
+import hashlib
+import pandas as pd
+import config
+from kb_store import get_current_generation, read_sources
+
+# --- On-Disk Layout ---
+# table_store/
+#   <sha256 of source bytes>.parquet   <- one columnar copy per distinct spreadsheet
+# Which tables are live is recorded per source in the generation's sources.json ("tables"),
+# so incremental builds, failed files and old generations all resolve the right copies.
+
+def table_name_for(file_name: str) -> str:
+    """SQL-safe table name derived from a file name, e.g. 'Q3 Sales.xlsx' -> 'q3_sales'."""
+    stem = os.path.splitext(file_name)[0]
+    name = re.sub(r"\W+", "_", stem).strip("_").lower() or "table"
+    return f"t_{name}" if name[0].isdigit() else name
+
+class ParquetTableWriter:
+    """
+    Writes a table to TABLE_STORE_PATH chunk by chunk, so large CSVs never need to be held in
+    memory. Files are named by the hash of the source bytes, so unchanged spreadsheets are
+    written once. Requires pyarrow. Column types are inferred from the first chunk and widened
+    (numbers to float64, anything else to string) when a later chunk doesn't fit them.
+    """
+
+    def __init__(self, file_bytes: bytes, file_name: str):
+        import pyarrow  # noqa: F401  (fail early when the optional dependency is missing)
+        os.makedirs(config.TABLE_STORE_PATH, exist_ok=True)
+        self.file_name = file_name
+        self.path = os.path.join(config.TABLE_STORE_PATH, f"{hashlib.sha256(file_bytes).hexdigest()}.parquet")
+        self.exists = os.path.exists(self.path)
+        self._tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        self._writer, self._schema = None, None
+        self.rows = 0
+
+    def write(self, df: pd.DataFrame):
+        self.rows += len(df)
+        if self.exists:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        # Column names must be strings in Parquet.
+        table = pa.Table.from_pandas(df.rename(columns=str), preserve_index=False)
+        table = table.replace_schema_metadata(None)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = pq.ParquetWriter(self._tmp_path, self._schema)
+        elif not table.schema.equals(self._schema):
+            try:
+                table = table.cast(self._schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                # A later chunk doesn't fit the types inferred so far (e.g. text in a column that
+                # was empty until now): widen the schema, rewrite what was written, and carry on.
+                self._widen(_unify_schemas(self._schema, table.schema))
+                table = table.cast(self._schema)
+        self._writer.write_table(table)
+
+    def _widen(self, schema):
+        """Rewrites the rows written so far under a wider schema, one row group at a time."""
+        import pyarrow.parquet as pq
+        self._writer.close()
+        widened_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        writer = pq.ParquetWriter(widened_path, schema)
+        written = pq.ParquetFile(self._tmp_path)
+        for group in range(written.num_row_groups):
+            writer.write_table(written.read_row_group(group).cast(schema))
+        written.close()
+        os.remove(self._tmp_path)
+        self._writer, self._schema, self._tmp_path = writer, schema, widened_path
+
+    def close(self, columns) -> dict:
+        """Finishes the file and returns the catalog entry stored with the source."""
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self._tmp_path, self.path)
+        return {"name": table_name_for(self.file_name), "path": self.path, "rows": self.rows,
+                "columns": [str(col) for col in columns]}
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+def _unify_schemas(schema, other):
+    """Field-wise widest type of two schemas: numbers widen to float64, any other conflict to string."""
+    import pyarrow as pa
+
+    def widen(a, b):
+        if a.equals(b) or pa.types.is_null(b):
+            return a
+        if pa.types.is_null(a):
+            return b
+        if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in (a, b)):
+            return pa.float64()
+        return pa.string()
+
+    if schema.names != other.names:
+        raise ValueError(f"Columns changed between chunks: {schema.names} vs {other.names}")
+    return pa.schema([pa.field(field.name, widen(field.type, other_field.type))
+                      for field, other_field in zip(schema, other)])
+
+# --- Catalog ---
+def get_table_catalog() -> dict:
+    """Returns {table name: catalog entry} for every table in the published knowledge base."""
+    current = get_current_generation()
+    if current is None or current[0] is None:
+        return {}
+    catalog = {}
+    for key, entry in sorted((read_sources(current[0]) or {}).items()):
+        for table in entry.get("tables", []):
+            name = table["name"]
+            if name in catalog:
+                # Two files with the same stem: disambiguate with a short id from the source key.
+                name = f"{name}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:6]}"
+            catalog[name] = {**table, "name": name, "source": entry["name"]}
+    return catalog
+
+def prune_tables():
+    """Deletes Parquet files no longer referenced by any generation still on disk."""
+    if not os.path.isdir(config.TABLE_STORE_PATH) or not os.path.isdir(config.KB_STORE_PATH):
+        return
+    referenced = set()
+    for generation in os.listdir(config.KB_STORE_PATH):
+        if not os.path.isdir(os.path.join(config.KB_STORE_PATH, generation)):
+            continue
+        for entry in (read_sources(generation) or {}).values():
+            referenced.update(os.path.basename(table["path"]) for table in entry.get("tables", []))
+    for file_name in os.listdir(config.TABLE_STORE_PATH):
+        if file_name.endswith(".parquet") and file_name not in referenced:
+            os.remove(os.path.join(config.TABLE_STORE_PATH, file_name))
+
+# --- Query Engine ---
+_READ_ONLY_STATEMENT = re.compile(r"^\s*(select|with|describe|summarize|show)\b", re.IGNORECASE)
+
+def run_table_query(sql: str, max_rows: int | None = None) -> pd.DataFrame:
+    """
+    Runs a read-only SQL query with DuckDB over the knowledge base tables, each exposed as a
+    view on its Parquet file. File access is restricted to the table store, so queries can
+    only read the ingested tables.
+    """
+    import duckdb
+    if not _READ_ONLY_STATEMENT.match(sql) or ";" in sql.strip().rstrip(";"):
+        raise ValueError("Only a single SELECT/WITH/DESCRIBE/SUMMARIZE/SHOW statement is allowed.")
+    catalog = get_table_catalog()
+    if not catalog:
+        raise ValueError("No tables are available. Build the Knowledge Base with CSV/Excel files first.")
+    con = duckdb.connect()
+    try:
+        table_dir = os.path.abspath(config.TABLE_STORE_PATH)
+        con.execute(f"SET allowed_directories = ['{table_dir}']")
+        con.execute("SET enable_external_access = false")
+        con.execute("SET lock_configuration = true")
+        for name, table in catalog.items():
+            path = os.path.abspath(table["path"]).replace("'", "''")
+            con.execute(f'CREATE VIEW "{name}" AS SELECT * FROM read_parquet(\'{path}\')')
+        result = con.execute(sql.strip().rstrip(";"))
+        return result.fetch_df() if max_rows is None else pd.DataFrame(
+            result.fetchmany(max_rows), columns=[col[0] for col in result.description])
+    finally:
+        con.close()
@@ -0,0 +1,145 @@
+# tabular_ingestion.py
+import io
+import os
+import pickle
+import tempfile
+import pandas as pd
+from langchain_community.docstore.document import Document
+import config
+from table_store import ParquetTableWriter
+from table_profiler import TableProfiler
+
+# --- Tabular Data Processing and Helpers ---
+def process_tabular_data(file_bytes: bytes, file_name: str, file_ext: str, store_table: bool = True,
+                         on_rows=None) -> list[Document]:
+    """
+    Turns a CSV/Excel file into a table overview document followed by its row documents, and
+    stores the table as Parquet for the table query tool. Once the table is queryable, row
+    documents are only produced when TABLE_EMBED_ROWS is set. With on_rows, each read chunk's
+    row documents are handed to on_rows(batch) as they are made (e.g. RowSpool.write) and only
+    the overview is returned, so the rows of a large table are never collected in one list.
+    """
+    documents = []
+    table_writer = None
+    if store_table:
+        try:
+            table_writer = ParquetTableWriter(file_bytes, file_name)
+        except ImportError:
+            print("pyarrow is not installed; tables will only be indexed as row documents.")
+    embed_rows = table_writer is None or config.TABLE_EMBED_ROWS
+    try:
+        # The overview is profiled in the same pass as Parquet writing and row ingestion.
+        profiler, row_documents = TableProfiler(), []
+        on_rows = on_rows or row_documents.extend
+        for df in iter_table_chunks(io.BytesIO(file_bytes), file_ext):
+            profiler.update(df)
+            if table_writer is not None:
+                try:
+                    table_writer.write(df)
+                except Exception as e:
+                    print(f"Could not store {file_name} as a queryable table ({e}); indexing its rows instead.")
+                    table_writer.abort()
+                    table_writer = None
+                    if not embed_rows:
+                        # Rows of the chunks read so far were skipped; start over producing all of them.
+                        return process_tabular_data(file_bytes, file_name, file_ext, store_table=False, on_rows=on_rows)
+            if embed_rows:
+                on_rows(create_row_documents(df, file_name, file_ext))
+        if profiler.head is None:
+            return documents
+        table = table_writer.close(profiler.columns) if table_writer is not None else None
+        overview_metadata = {"source": file_name, "content_type": "table_overview"}
+        if table is not None:
+            overview_metadata["table"] = table
+        documents.append(Document(page_content=create_table_overview(profiler, file_name, table),
+                                  metadata=overview_metadata))
+        documents.extend(row_documents)
+    except Exception as e:
+        print(f"Error processing tabular data {file_name}: {e}")
+        if table_writer is not None:
+            table_writer.abort()
+    return documents
+
+class RowSpool:
+    """
+    Row documents written to a temporary file one batch at a time. A partition worker fills it
+    and sends back only the path; the builder then reads the batches back one by one into the
+    segment writer, so neither process holds a large table's rows as Documents all at once.
+    """
+
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(prefix="table-rows-", suffix=".pkl")
+        self._file = os.fdopen(fd, "wb")
+        self.count = 0
+
+    def write(self, documents: list[Document]):
+        if documents:
+            pickle.dump(documents, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.count += len(documents)
+
+    def close(self):
+        # The open file can't be pickled; only the path travels back from the worker.
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def batches(self):
+        """Yields the stored batches in order, then deletes the file."""
+        try:
+            with open(self.path, "rb") as f:
+                while True:
+                    try:
+                        yield pickle.load(f)
+                    except EOFError:
+                        return
+        finally:
+            self.discard()
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def iter_table_chunks(source, file_ext: str, chunk_rows: int | None = None):
+    """
+    Yields the table as DataFrames of at most chunk_rows rows. CSVs are parsed incrementally,
+    so a path or file object larger than memory can be streamed; Excel has no chunked reader
+    and is yielded whole. Row indexes keep counting across chunks.
+    """
+    if file_ext == 'csv':
+        yield from pd.read_csv(source, chunksize=chunk_rows or config.TABLE_READ_CHUNK_ROWS)
+    else:
+        yield pd.read_excel(source)
+
+def create_table_overview(profiler: TableProfiler, file_name: str, table: dict | None = None) -> str:
+    """Overview text for a profiled table, bounded by TABLE_OVERVIEW_MAX_TOKENS however wide or long it is."""
+    return profiler.render(file_name, table)
+
+def create_row_documents(df: pd.DataFrame, file_name: str, file_ext: str, rows_per_document: int | None = None) -> list[Document]:
+    """
+    Builds one document per row (or per group of rows_per_document consecutive rows).
+    Cells are formatted a column at a time from plain Python lists instead of iterating rows
+    with iterrows(), which allocates a Series per row; empty cells are left out.
+    """
+    if df.empty:
+        return []
+    rows_per_document = rows_per_document or config.TABLE_ROWS_PER_DOCUMENT
+    columns = []
+    for col in df.columns:
+        prefix = f"- {col}: "
+        present = df[col].notna().tolist()
+        columns.append([prefix + str(val) if ok else None for val, ok in zip(df[col].tolist(), present)])
+    row_indexes = df.index.tolist()
+    row_texts = [f"Record from {file_name} (Row {idx + 1}):\n" + "\n".join([cell for cell in cells if cell is not None])
+                 for idx, cells in zip(row_indexes, zip(*columns))]
+
+    if rows_per_document == 1:
+        return [Document(page_content=text, metadata={"source": file_name, "content_type": "table_row", "row_index": idx})
+                for idx, text in zip(row_indexes, row_texts)]
+    documents = []
+    for start in range(0, len(row_texts), rows_per_document):
+        end = min(start + rows_per_document, len(row_texts))
+        documents.append(Document(page_content="\n\n".join(row_texts[start:end]),
+                                  metadata={"source": file_name, "content_type": "table_rows",
+                                            "row_index": row_indexes[start], "row_end": row_indexes[end - 1]}))
+    return documents
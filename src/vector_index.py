@@ -0,0 +1,180 @@
+# vector_index.py
+import os
+import json
+import pickle
+import math
+import numpy as np
+import config
+
+# --- Approximate Nearest Neighbour Indexes ---
+# The flat L2 index inside faiss_index_store/ stays the source of truth: incremental builds
+# delete and merge vectors there, which HNSW cannot do. Each generation's ANN index is derived
+# from it (see update_ann_index) and, when present, is what queries search. Vectors are added in
+# the flat index's order, so result positions map to chunk ids through the same index_to_docstore_id.
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+def _ivf_lists(n_vectors: int) -> int:
+    return config.IVF_NLIST or max(1, int(4 * math.sqrt(n_vectors)))
+
+def _pq_subquantizers(dim: int) -> int:
+    """PQ_M if set, else the largest divisor of dim up to dim/16 (~16x compression at 8 bits per code)."""
+    if config.PQ_M:
+        return config.PQ_M
+    target = max(1, dim // 16)
+    return max(m for m in range(1, target + 1) if dim % m == 0)
+
+def _training_sample(flat_index, sample_size: int) -> np.ndarray:
+    n_vectors = flat_index.ntotal
+    if n_vectors <= sample_size:
+        return flat_index.reconstruct_n(0, n_vectors)
+    ids = np.sort(np.random.default_rng(0).choice(n_vectors, sample_size, replace=False))
+    return np.vstack([flat_index.reconstruct(int(i)) for i in ids]).astype(np.float32)
+
+def create_ann_index(dim: int, index_type: str, n_lists: int | None = None):
+    """An empty, untrained index of the given type for vectors of dimension dim."""
+    import faiss
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.HNSW_M)
+        index.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+        return index
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, dim, n_lists)
+    if index_type == "ivf_pq":
+        return faiss.IndexIVFPQ(quantizer, dim, n_lists, _pq_subquantizers(dim), config.PQ_NBITS)
+    raise ValueError(f"Unknown vector index type '{index_type}'; expected one of {', '.join(INDEX_TYPES)}.")
+
+def build_ann_index(flat_index, index_type: str | None = None):
+    """
+    Builds an ANN index holding the same vectors as flat_index, or returns None when the flat
+    index should be searched directly (VECTOR_INDEX_TYPE "flat" or fewer than
+    VECTOR_INDEX_MIN_VECTORS vectors). IVF indexes are trained on a sample of at most
+    VECTOR_INDEX_TRAIN_SAMPLE vectors, and vectors are copied over in batches so the build
+    never holds a second full copy of them.
+    """
+    index_type = index_type or config.VECTOR_INDEX_TYPE
+    n_vectors = flat_index.ntotal
+    if index_type == "flat" or n_vectors < config.VECTOR_INDEX_MIN_VECTORS:
+        return None
+    if index_type.startswith("ivf"):
+        sample = _training_sample(flat_index, config.VECTOR_INDEX_TRAIN_SAMPLE)
+        # Keep enough training points per list (faiss wants ~39) when the corpus is small.
+        n_lists = min(_ivf_lists(n_vectors), max(1, len(sample) // 39))
+        index = create_ann_index(flat_index.d, index_type, n_lists)
+        index.train(sample)
+        del sample
+    else:
+        index = create_ann_index(flat_index.d, index_type)
+    _add_vectors(index, flat_index, 0)
+    return index
+
+def _add_vectors(index, flat_index, start: int, batch: int = 100_000):
+    """Adds flat_index's vectors from position start on to index, in batches."""
+    for offset in range(start, flat_index.ntotal, batch):
+        index.add(flat_index.reconstruct_n(offset, min(batch, flat_index.ntotal - offset)))
+    apply_search_params(index)
+
+def update_ann_index(flat_index, previous_path: str | None, vectors_removed: bool) -> tuple:
+    """
+    Returns (ANN index, info) for a new generation, or (None, None) when the flat index is
+    searched directly. The previous generation's index is reused where possible, so an
+    incremental update costs in proportion to the change:
+      - only vectors appended: the new vectors are added to the previous index (any type);
+      - vectors removed from an IVF index: its trained quantizer and PQ codebooks are kept and
+        the vectors re-added, which needs no training;
+      - vectors removed from HNSW, or the corpus grown or shrunk by more than
+        VECTOR_INDEX_RETRAIN_FACTOR since the last training: full rebuild.
+    """
+    index_type = config.VECTOR_INDEX_TYPE
+    n_vectors = flat_index.ntotal
+    if index_type == "flat" or n_vectors < config.VECTOR_INDEX_MIN_VECTORS:
+        return None, None
+    previous, info = _load_previous(previous_path, index_type, flat_index.d)
+    if previous is not None:
+        factor = config.VECTOR_INDEX_RETRAIN_FACTOR
+        trained = info["trained_vectors"]
+        if index_type == "hnsw" or trained / factor <= n_vectors <= trained * factor:
+            if not vectors_removed and previous.ntotal <= n_vectors:
+                # Existing vectors kept their positions; only the appended ones are new.
+                print(f"Reusing the previous ANN index: adding {n_vectors - previous.ntotal} vectors.")
+                _add_vectors(previous, flat_index, previous.ntotal)
+                return previous, info
+            if index_type != "hnsw":
+                print("Reusing the previous ANN index training: re-adding vectors.")
+                previous.reset()
+                _add_vectors(previous, flat_index, 0)
+                return previous, info
+        del previous
+    print(f"Building a new {index_type} index over {n_vectors} vectors.")
+    return build_ann_index(flat_index, index_type), {"type": index_type, "trained_vectors": n_vectors}
+
+def _load_previous(path: str | None, index_type: str, dim: int) -> tuple:
+    if not path or not os.path.exists(path) or not os.path.exists(_info_path(path)):
+        return None, None
+    with open(_info_path(path), "r", encoding="utf-8") as f:
+        info = json.load(f)
+    if info.get("type") != index_type:
+        return None, None
+    index = load_ann_index(path)
+    return (index, info) if index.d == dim else (None, None)
+
+def _info_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+def apply_search_params(index, nprobe: int | None = None, ef_search: int | None = None):
+    """Sets the query-time recall/latency knobs: nprobe for IVF indexes, efSearch for HNSW."""
+    import faiss
+    index = faiss.downcast_index(index)
+    if hasattr(index, "nprobe"):
+        index.nprobe = min(nprobe or config.IVF_NPROBE, index.nlist)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search or config.HNSW_EF_SEARCH
+
+def save_ann_index(index, path: str, info: dict | None = None):
+    """Writes the index plus a small JSON sidecar (type, vectors it was trained on) used by the next update."""
+    import faiss
+    faiss.write_index(index, path)
+    if info is not None:
+        with open(_info_path(path), "w", encoding="utf-8") as f:
+            json.dump(info, f)
+
+def load_ann_index(path: str):
+    import faiss
+    index = faiss.read_index(path)
+    apply_search_params(index)
+    return index
+
+# --- Flat Vector Store Files ---
+# faiss_index_store/ keeps LangChain's save_local layout (index.faiss plus index.pkl with a docstore
+# and the position -> id map), so FAISS.load_local still opens it, but the docstore is left empty:
+# chunk text lives in the generation's chunk store instead.
+
+def create_flat_index(vectors):
+    import faiss
+    index = faiss.IndexFlatL2(len(vectors[0]))
+    index.add(np.asarray(vectors, dtype=np.float32))
+    return index
+
+def save_flat_store(index_dir: str, index, chunk_ids: list[int]):
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    os.makedirs(index_dir, exist_ok=True)
+    faiss.write_index(index, os.path.join(index_dir, "index.faiss"))
+    with open(os.path.join(index_dir, "index.pkl"), "wb") as f:
+        pickle.dump((InMemoryDocstore(), {pos: str(chunk_id) for pos, chunk_id in enumerate(chunk_ids)}), f)
+
+def load_flat_store(index_dir: str) -> tuple:
+    """
+    Returns (flat index, chunk ids in index order, docstore). The docstore is empty unless the
+    store was written before chunk text moved to the chunk store.
+    """
+    import faiss
+    with open(os.path.join(index_dir, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    chunk_ids = [int(index_to_docstore_id[pos]) for pos in range(len(index_to_docstore_id))]
+    return faiss.read_index(os.path.join(index_dir, "index.faiss")), chunk_ids, docstore
+
+def describe_index(index) -> str:
+    import faiss
+    size_mb = faiss.serialize_index(index).nbytes / (1024 * 1024)
+    return f"{type(faiss.downcast_index(index)).__name__} with {index.ntotal} vectors ({size_mb:.1f} MB)"
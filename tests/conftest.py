@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# The application modules are flat files in src/, imported by name as the app does.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
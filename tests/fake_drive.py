@@ -0,0 +1,97 @@
+# fake_drive.py
+import re
+import copy
+import itertools
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+_PARENT_QUERY = re.compile(r"'([^']+)' in parents and trashed = false")
+
+class _Request:
+    def __init__(self, result):
+        self._result = result
+
+    def execute(self):
+        return copy.deepcopy(self._result)
+
+# --- In-Memory Drive API ---
+class FakeDrive:
+    """
+    The subset of the Drive v3 service that DriveSource calls, backed by a dict of files and a
+    change log. Pass `lambda: drive` as DriveSource's service_factory. Mutations (add, modify,
+    trash, move) append to the change log like Drive does; page tokens are positions in it.
+    Listings and change feeds honour pageSize, so pagination is exercised too.
+    """
+
+    def __init__(self):
+        self.files_by_id = {}
+        self.changes_log = []
+        self._times = itertools.count(1)
+
+    # Mutations
+    def add(self, file_id: str, parent: str, name: str | None = None, mime_type: str = "application/pdf") -> dict:
+        self.files_by_id[file_id] = {"id": file_id, "name": name or file_id, "mimeType": mime_type,
+                                     "parents": [parent], "trashed": False}
+        return self._changed(file_id)
+
+    def add_folder(self, folder_id: str, parent: str) -> dict:
+        return self.add(folder_id, parent, mime_type=FOLDER_MIME_TYPE)
+
+    def modify(self, file_id: str) -> dict:
+        return self._changed(file_id)
+
+    def trash(self, file_id: str) -> dict:
+        self.files_by_id[file_id]["trashed"] = True
+        return self._changed(file_id)
+
+    def move(self, file_id: str, parent: str) -> dict:
+        self.files_by_id[file_id]["parents"] = [parent]
+        return self._changed(file_id)
+
+    def _changed(self, file_id: str) -> dict:
+        file = self.files_by_id[file_id]
+        file["modifiedTime"] = f"2024-01-01T00:00:{next(self._times):02d}Z"
+        self.changes_log.append({"fileId": file_id, "removed": False, "file": copy.deepcopy(file)})
+        return file
+
+    # Drive v3 service surface
+    def files(self):
+        return _Files(self)
+
+    def changes(self):
+        return _Changes(self)
+
+class _Files:
+    def __init__(self, drive: FakeDrive):
+        self.drive = drive
+
+    def list(self, q: str, pageSize: int, pageToken: str | None = None, **kwargs):
+        parent = _PARENT_QUERY.fullmatch(q).group(1)
+        matches = [f for f in self.drive.files_by_id.values() if parent in f["parents"] and not f["trashed"]]
+        start = int(pageToken or 0)
+        response = {"files": matches[start:start + pageSize]}
+        if start + pageSize < len(matches):
+            response["nextPageToken"] = str(start + pageSize)
+        return _Request(response)
+
+    def get(self, fileId: str, **kwargs):
+        return _Request(self.drive.files_by_id[fileId])
+
+    def get_media(self, fileId: str, **kwargs):
+        return _Request(f"content of {fileId}".encode())
+
+class _Changes:
+    def __init__(self, drive: FakeDrive):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return _Request({"startPageToken": str(len(self.drive.changes_log))})
+
+    def list(self, pageToken: str, pageSize: int, **kwargs):
+        start = int(pageToken)
+        end = min(start + pageSize, len(self.drive.changes_log))
+        response = {"changes": self.drive.changes_log[start:end]}
+        if end < len(self.drive.changes_log):
+            response["nextPageToken"] = str(end)
+        else:
+            response["newStartPageToken"] = str(end)
+        return _Request(response)
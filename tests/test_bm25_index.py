@@ -0,0 +1,75 @@
+# test_bm25_index.py
+import random
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+from bm25_index import SparseBM25Index
+
+def make_corpus(n_docs: int, seed: int) -> list[list[str]]:
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(60)]
+    # A few very common terms exercise BM25Okapi's negative-idf floor.
+    return [rng.choices(vocab, k=rng.randint(1, 30)) + ["the"] * rng.randint(0, 3) + ["a"]
+            for _ in range(n_docs)]
+
+QUERIES = [
+    ["w1"],
+    ["w2", "w3", "w2"],              # repeated query term counts twice
+    ["w4", "unknown", "w5"],         # unknown terms contribute nothing
+    ["unknown", "missing"],
+    ["the", "a", "w7", "w7", "w7"],
+    [],
+]
+
+def scores_by_chunk(index: SparseBM25Index, query: list[str]) -> dict:
+    return dict(zip(np.asarray(index.chunk_ids).tolist(), index.get_scores(query).tolist()))
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_scores_match_bm25okapi(query):
+    corpus = make_corpus(200, seed=1)
+    expected = BM25Okapi(corpus).get_scores(query)
+    np.testing.assert_allclose(SparseBM25Index.from_tokenized(corpus).get_scores(query), expected, rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_top_k_matches_bm25okapi(query):
+    corpus = make_corpus(200, seed=2)
+    expected = BM25Okapi(corpus).get_scores(query)
+    chunk_ids, scores = SparseBM25Index.from_tokenized(corpus).top_k(query, 10)
+    positive = np.sort(expected[expected > 0])[::-1][:10]
+    np.testing.assert_allclose(scores, positive, rtol=1e-12)
+    np.testing.assert_allclose(expected[chunk_ids], scores, rtol=1e-12)
+    # Best first, ties broken by the lower chunk id.
+    assert list(zip(-scores, chunk_ids)) == sorted(zip(-scores, chunk_ids))
+
+def test_save_and_load_round_trip(tmp_path):
+    corpus = make_corpus(50, seed=3)
+    index = SparseBM25Index.from_tokenized(corpus, chunk_ids=list(range(100, 150)))
+    index.save(str(tmp_path / "bm25"))
+    loaded = SparseBM25Index.load(str(tmp_path / "bm25"))
+    for query in QUERIES:
+        assert scores_by_chunk(loaded, query) == pytest.approx(scores_by_chunk(index, query))
+
+def test_merged_matches_fresh_build():
+    corpus = make_corpus(300, seed=4)
+    chunk_ids = list(range(300))
+    removed = set(range(0, 300, 7))
+    parts = [SparseBM25Index.from_tokenized(corpus[start:start + 100], chunk_ids=chunk_ids[start:start + 100])
+             for start in range(0, 300, 100)]
+    merged = SparseBM25Index.merged(parts, removed)
+    kept = [i for i in chunk_ids if i not in removed]
+    fresh = SparseBM25Index.from_tokenized([corpus[i] for i in kept], chunk_ids=kept)
+    assert sorted(np.asarray(merged.chunk_ids).tolist()) == kept
+    for query in QUERIES:
+        assert scores_by_chunk(merged, query) == pytest.approx(scores_by_chunk(fresh, query), rel=1e-12, abs=1e-12)
+
+def test_merged_with_added_documents_matches_fresh_build():
+    # An incremental build: the previous generation minus removed chunks, plus a new segment.
+    corpus = make_corpus(200, seed=5)
+    added = make_corpus(40, seed=6)
+    index = SparseBM25Index.from_tokenized(corpus)
+    removed = set(range(0, 200, 3))
+    updated = SparseBM25Index.merged([index, SparseBM25Index.from_tokenized(added, chunk_ids=list(range(200, 240)))], removed)
+    kept = [i for i in range(200) if i not in removed]
+    fresh = SparseBM25Index.from_tokenized([corpus[i] for i in kept] + added, chunk_ids=kept + list(range(200, 240)))
+    for query in QUERIES + [["unknown"] + added[0][:3]]:
+        assert scores_by_chunk(updated, query) == pytest.approx(scores_by_chunk(fresh, query), rel=1e-12, abs=1e-12)
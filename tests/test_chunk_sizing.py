@@ -0,0 +1,34 @@
+# test_chunk_sizing.py
+from langchain_community.docstore.document import Document
+from chunk_sizing import ChunkSizer
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+def sizer(**kwargs) -> ChunkSizer:
+    return ChunkSizer(**{"min_tokens": 10, "max_tokens": 50, "overlap_tokens": 0, "count_tokens": count_words, **kwargs})
+
+def chunk(text: str, title: str | None = None) -> Document:
+    return Document(page_content=text, metadata={"section_title": title} if title else {})
+
+def test_merge_records_every_section_title():
+    merged = sizer().apply([chunk("a b", "Title A"), chunk("c d", "Title B"), chunk("e f", "Title C")])
+    assert len(merged) == 1
+    assert merged[0].metadata["section_titles"] == ["Title A", "Title B", "Title C"]
+
+def test_merging_an_untitled_chunk_adds_no_title():
+    merged = sizer().apply([chunk("a b", "Title A"), chunk("c d", "Title B"), chunk("e f", "Title C"), chunk("g h")])
+    assert len(merged) == 1
+    assert merged[0].metadata["section_titles"] == ["Title A", "Title B", "Title C"]
+    assert merged[0].page_content == "a b\nc d\ne f\ng h"
+
+def test_untitled_chunk_merged_into_a_titled_one_keeps_its_title():
+    merged = sizer().apply([chunk("a b", "Title A"), chunk("c d")])
+    assert "section_titles" not in merged[0].metadata
+    assert merged[0].metadata["section_title"] == "Title A"
+
+def test_text_without_spaces_is_cut_to_the_limit():
+    pieces = sizer(count_tokens=lambda text: len(text) // 4).split(chunk("x" * 1000))
+    assert len(pieces) > 1
+    assert all(piece.metadata["tokens"] <= 50 for piece in pieces)
+    assert "".join(piece.page_content for piece in pieces) == "x" * 1000
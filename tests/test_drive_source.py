@@ -0,0 +1,120 @@
+# test_drive_source.py
+import pytest
+import config
+from drive_source import DriveSource, DriveSync
+from fake_drive import FakeDrive
+
+ROOT = "root"
+
+@pytest.fixture
+def drive(monkeypatch):
+    # Tiny pages so listings and change feeds have to follow their page tokens.
+    monkeypatch.setattr(config, "DRIVE_PAGE_SIZE", 2)
+    drive = FakeDrive()
+    drive.add_folder("sub", ROOT)
+    for file_id in ("a", "b", "c"):
+        drive.add(file_id, ROOT)
+    drive.add("d", "sub")
+    drive.add_folder("elsewhere", "other-root")
+    drive.add("outside", "elsewhere")
+    return drive
+
+def synced(drive: FakeDrive) -> DriveSync:
+    """A DriveSync that has completed its first full scan, as stored after a build."""
+    sync = DriveSync(DriveSource(None, ROOT, service_factory=lambda: drive))
+    sync.sync()
+    return DriveSync(sync.source, sync.finish([]))
+
+def ids(files: list) -> set:
+    return {file["id"] for file in files}
+
+def test_full_scan_lists_the_whole_tree():
+    drive = FakeDrive()
+    for i in range(5):
+        drive.add(f"f{i}", ROOT)
+    drive.add_folder("sub", ROOT)
+    drive.add("nested", "sub")
+    drive.add("gone", ROOT)
+    drive.trash("gone")
+    sync = DriveSync(DriveSource(None, ROOT, service_factory=lambda: drive))
+    result = sync.sync()
+    assert result["full_scan"]
+    assert ids(result["files"]) == {"f0", "f1", "f2", "f3", "f4", "nested"}
+    assert result["removed"] == set()
+    assert sync.state["folders"] == [ROOT, "sub"]
+    assert sync.state["page_token"] == str(len(drive.changes_log))
+
+def test_state_for_another_folder_forces_a_full_scan(drive):
+    state = synced(drive).finish([])
+    sync = DriveSync(DriveSource(None, "sub", service_factory=lambda: drive), state)
+    result = sync.sync()
+    assert result["full_scan"]
+    assert ids(result["files"]) == {"d"}
+
+def test_no_changes(drive):
+    result = synced(drive).sync()
+    assert not result["full_scan"]
+    assert result["files"] == [] and result["removed"] == set()
+
+def test_modified_file_is_returned(drive):
+    sync = synced(drive)
+    drive.modify("d")
+    drive.modify("outside")
+    result = sync.sync()
+    assert not result["full_scan"]
+    assert ids(result["files"]) == {"d"}
+    # Changes outside the tree can't be told apart from moves out, so they read as removals;
+    # the builder only drops ids it has sources for.
+    assert result["removed"] == {"outside"}
+
+def test_trashed_file_is_removed(drive):
+    sync = synced(drive)
+    drive.modify("a")
+    drive.trash("a")
+    drive.trash("b")
+    result = sync.sync()
+    assert result["files"] == []
+    assert result["removed"] == {"a", "b"}
+
+def test_file_moved_out_is_removed_and_moved_in_is_added(drive):
+    sync = synced(drive)
+    drive.move("c", "elsewhere")
+    drive.move("outside", "sub")
+    result = sync.sync()
+    assert ids(result["files"]) == {"outside"}
+    assert result["removed"] == {"c"}
+
+def test_folder_moved_in_brings_its_contents(drive):
+    sync = synced(drive)
+    drive.move("elsewhere", "sub")
+    result = sync.sync()
+    assert not result["full_scan"]
+    assert ids(result["files"]) == {"outside"}
+    assert "elsewhere" in sync.state["folders"]
+    # Later changes inside the adopted folder are now tracked.
+    drive.add("new", "elsewhere")
+    assert ids(sync.sync()["files"]) == {"new"}
+
+def test_folder_moved_out_forces_a_rescan(drive):
+    sync = synced(drive)
+    drive.move("sub", "other-root")
+    result = sync.sync()
+    assert result["full_scan"]
+    assert ids(result["files"]) == {"a", "b", "c"}
+    assert sync.state["folders"] == [ROOT]
+
+def test_failed_files_are_retried(drive):
+    sync = synced(drive)
+    drive.modify("a")
+    sync.sync()
+    sync = DriveSync(sync.source, sync.finish(["a"]))
+    result = sync.sync()
+    assert ids(result["files"]) == {"a"}
+    assert sync.finish([])["retry"] == []
+
+def test_invalid_token_falls_back_to_a_full_scan(drive):
+    state = synced(drive).finish([])
+    state["page_token"] = "not-a-token"
+    result = DriveSync(DriveSource(None, ROOT, service_factory=lambda: drive), state).sync()
+    assert result["full_scan"]
+    assert ids(result["files"]) == {"a", "b", "c", "d"}
@@ -0,0 +1,35 @@
+# test_table_profiler.py
+import numpy as np
+import pandas as pd
+from table_profiler import TableProfiler
+
+def profile(chunks: list[pd.DataFrame]) -> TableProfiler:
+    profiler = TableProfiler(sample_size=100, top_k=3)
+    for df in chunks:
+        profiler.update(df)
+    return profiler
+
+def test_text_column_with_all_missing_first_chunk():
+    # pandas reads the blank first chunk as float64; the later text must still be profiled as text.
+    profiler = profile([pd.DataFrame({"Note": [np.nan] * 3}),
+                        pd.DataFrame({"Note": ["late", "late", "other"]})])
+    note = profiler.columns["Note"]
+    assert not note.numeric
+    assert note.dtype == "object"
+    line = note.describe(None, 3)
+    assert line.startswith("- Note (object): 3 values; 3 missing")
+    assert "top: late (2), other (1)" in line
+
+def test_numeric_column_widens_to_text():
+    profiler = profile([pd.DataFrame({"Code": [1, 2, 3]}), pd.DataFrame({"Code": ["A7", "A7", "4"]})])
+    code = profiler.columns["Code"]
+    assert not code.numeric
+    assert "top: A7 (2)" in code.describe(None, 3)
+
+def test_numeric_strings_stay_numeric():
+    profiler = profile([pd.DataFrame({"Amount": [np.nan, np.nan]}),
+                        pd.DataFrame({"Amount": [1.5, 2.5]}), pd.DataFrame({"Amount": ["3.5", None]})])
+    amount = profiler.columns["Amount"]
+    assert amount.numeric and amount.dtype == "float64"
+    assert (amount.min, amount.max, amount.mean) == (1.5, 3.5, 2.5)
+    assert amount.missing == 3
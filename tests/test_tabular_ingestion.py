@@ -0,0 +1,51 @@
+# test_tabular_ingestion.py
+import os
+import pickle
+import pytest
+import config
+from tabular_ingestion import process_tabular_data, RowSpool
+
+def make_csv(rows: int) -> bytes:
+    return ("id,name\n" + "".join(f"{i},item {i}\n" for i in range(rows))).encode()
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "TABLE_READ_CHUNK_ROWS", 10)
+    monkeypatch.setattr(config, "TABLE_STORE_PATH", str(tmp_path / "tables"))
+
+def test_rows_are_handed_over_per_chunk():
+    batches = []
+    documents = process_tabular_data(make_csv(25), "items.csv", "csv", store_table=False, on_rows=batches.append)
+    assert [doc.metadata["content_type"] for doc in documents] == ["table_overview"]
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert batches[2][-1].metadata["row_index"] == 24
+
+def test_without_on_rows_rows_follow_the_overview():
+    documents = process_tabular_data(make_csv(25), "items.csv", "csv", store_table=False)
+    assert len(documents) == 26
+    assert documents[1].page_content.startswith("Record from items.csv (Row 1):")
+
+def test_stored_table_skips_rows_unless_asked(monkeypatch):
+    batches = []
+    documents = process_tabular_data(make_csv(25), "items.csv", "csv", on_rows=batches.append)
+    assert "table" in documents[0].metadata and batches == []
+    monkeypatch.setattr(config, "TABLE_EMBED_ROWS", True)
+    process_tabular_data(make_csv(25), "items.csv", "csv", on_rows=batches.append)
+    assert sum(len(batch) for batch in batches) == 25
+
+def test_row_spool_round_trip():
+    spool = RowSpool()
+    process_tabular_data(make_csv(25), "items.csv", "csv", store_table=False, on_rows=spool.write)
+    spool.close()
+    # What a partition worker sends back: the path and count, not the open file.
+    spool = pickle.loads(pickle.dumps(spool))
+    assert spool.count == 25
+    rows = [doc.metadata["row_index"] for batch in spool.batches() for doc in batch]
+    assert rows == list(range(25))
+    assert not os.path.exists(spool.path)
+
+def test_discarded_spool_removes_its_file():
+    spool = RowSpool()
+    spool.write(process_tabular_data(make_csv(3), "items.csv", "csv", store_table=False)[1:])
+    spool.discard()
+    assert not os.path.exists(spool.path)